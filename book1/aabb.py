@@ -0,0 +1,88 @@
+from interval import Interval, empty
+from ray import Ray
+from vec3 import Point3
+
+
+class AABB:
+    # Axis-aligned bounding box, stored as one interval per axis
+    x: Interval
+    y: Interval
+    z: Interval
+
+    def __init__(
+        self,
+        x: Interval = empty,
+        y: Interval = empty,
+        z: Interval = empty,
+    ) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_points(cls, a: Point3, b: Point3) -> "AABB":
+        # Treat the two points as extrema, in any order
+        return cls(
+            Interval(min(a.x, b.x), max(a.x, b.x)),
+            Interval(min(a.y, b.y), max(a.y, b.y)),
+            Interval(min(a.z, b.z), max(a.z, b.z)),
+        )
+
+    @classmethod
+    def surrounding(cls, a: "AABB", b: "AABB") -> "AABB":
+        return cls(
+            Interval.surrounding(a.x, b.x),
+            Interval.surrounding(a.y, b.y),
+            Interval.surrounding(a.z, b.z),
+        )
+
+    def axis(self, n: int) -> Interval:
+        if n == 1:
+            return self.y
+        if n == 2:
+            return self.z
+        return self.x
+
+    def longest_axis(self) -> int:
+        sizes = (self.x.size(), self.y.size(), self.z.size())
+        return sizes.index(max(sizes))
+
+    def centroid(self, n: int) -> float:
+        a = self.axis(n)
+        return 0.5 * (a.min_value + a.max_value)
+
+    def surface_area(self) -> float:
+        dx, dy, dz = self.x.size(), self.y.size(), self.z.size()
+        if dx < 0 or dy < 0 or dz < 0:
+            return 0.0
+        return 2 * (dx * dy + dy * dz + dz * dx)
+
+    def hit(self, r: Ray, ray_t: Interval) -> bool:
+        return self.hit_range(r, ray_t.min_value, ray_t.max_value)
+
+    def hit_range(self, r: Ray, t_min: float, t_max: float) -> bool:
+        # Slab test: clip the ray interval against each pair of planes
+        for a, origin, direction in (
+            (self.x, r.origin.x, r.direction.x),
+            (self.y, r.origin.y, r.direction.y),
+            (self.z, r.origin.z, r.direction.z),
+        ):
+            if direction == 0:
+                if origin < a.min_value or origin > a.max_value:
+                    return False
+                continue
+            inv_d = 1 / direction
+            t0 = (a.min_value - origin) * inv_d
+            t1 = (a.max_value - origin) * inv_d
+            if inv_d < 0:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_max <= t_min:
+                return False
+        return True
+
+
+empty_box = AABB(empty, empty, empty)
@@ -0,0 +1,152 @@
+from color import Color
+from framebuffer import Framebuffer
+from typing import List, Tuple
+import mmap
+import os
+import struct
+
+MAGIC = b"RTACCUM2"
+# Files from before the seed and sampler were stored
+OLD_MAGIC = b"RTACCUM1"
+# magic, width, height, samples per pass, passes done, next row, seed, sampler
+HEADER = struct.Struct("<8sIIIIIq16s")
+# Pad the header so the channel data stays 8-byte aligned
+HEADER_SIZE = 64
+# r, g, b sums and sample count per pixel
+CHANNELS = 4
+
+
+class AccumulationBuffer:
+    # Per-pixel sample sums and counts, backed by a memory-mapped file so
+    # a render can be checkpointed, resumed and topped up. With no path the
+    # buffer lives in anonymous memory. The seed and sampler are stored too,
+    # since samples from other streams must not be mixed into the sums.
+    width: int
+    height: int
+    samples_per_pass: int
+    path: str | None
+    # A seed of None draws the same streams as 0
+    seed: int
+    sampling: str
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        samples_per_pass: int,
+        path: str | None = None,
+        seed: int | None = None,
+        sampling: str = "random",
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.samples_per_pass = samples_per_pass
+        self.path = path
+        self.seed = seed or 0
+        self.sampling = sampling
+        size = HEADER_SIZE + 8 * CHANNELS * width * height
+
+        if path is None:
+            self.mm = mmap.mmap(-1, size)
+            self.write_header(0, 0)
+        else:
+            exists = os.path.exists(path)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if not exists or os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                    self.mm = mmap.mmap(fd, size)
+                    self.write_header(0, 0)
+                else:
+                    self.mm = mmap.mmap(fd, 0)
+                    self.check_header()
+            finally:
+                os.close(fd)
+        self.data = memoryview(self.mm)[HEADER_SIZE:].cast("d")
+
+    def write_header(self, passes_done: int, next_row: int) -> None:
+        self.mm[: HEADER.size] = HEADER.pack(
+            MAGIC,
+            self.width,
+            self.height,
+            self.samples_per_pass,
+            passes_done,
+            next_row,
+            self.seed,
+            self.sampling.encode(),
+        )
+
+    def check_header(self) -> None:
+        magic, width, height, samples_per_pass, _, _, seed, sampling_bytes = (
+            HEADER.unpack_from(self.mm)
+        )
+        if magic == OLD_MAGIC:
+            raise ValueError(
+                f"{self.path} was written without its seed and sampler and "
+                "cannot be resumed safely; start a new file"
+            )
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an accumulation buffer")
+        if (width, height, samples_per_pass) != (
+            self.width,
+            self.height,
+            self.samples_per_pass,
+        ):
+            raise ValueError(
+                f"{self.path} holds a {width}x{height} render with "
+                f"{samples_per_pass} samples per pass, expected "
+                f"{self.width}x{self.height} with {self.samples_per_pass}"
+            )
+        sampling = sampling_bytes.rstrip(b"\0").decode()
+        if (seed, sampling) != (self.seed, self.sampling):
+            raise ValueError(
+                f"{self.path} was rendered with seed {seed} and the {sampling} "
+                f"sampler, expected seed {self.seed} and the {self.sampling} "
+                "sampler"
+            )
+
+    @property
+    def progress(self) -> Tuple[int, int]:
+        # (completed passes, first row of the pass in progress)
+        _, _, _, _, passes_done, next_row, _, _ = HEADER.unpack_from(self.mm)
+        return passes_done, next_row
+
+    def add_row(self, j: int, sums: List[Color], target_count: int) -> None:
+        # Adds one pass worth of samples to row `j`. Pixels that already hold
+        # `target_count` samples are skipped, so replaying a row after an
+        # interrupted write does not count it twice.
+        data = self.data
+        k = CHANNELS * j * self.width
+        for color in sums:
+            if data[k + 3] < target_count:
+                data[k] += color.x
+                data[k + 1] += color.y
+                data[k + 2] += color.z
+                data[k + 3] += self.samples_per_pass
+            k += CHANNELS
+
+    def count(self, i: int, j: int) -> int:
+        return int(self.data[CHANNELS * (j * self.width + i) + 3])
+
+    def resolve(self, framebuffer: Framebuffer | None = None) -> Framebuffer:
+        # Average the sums into a framebuffer
+        fb = framebuffer or Framebuffer(self.width, self.height)
+        data = self.data
+        out = fb.data
+        for p in range(self.width * self.height):
+            k = CHANNELS * p
+            n = data[k + 3]
+            scale = 1.0 / n if n else 0.0
+            out[3 * p] = data[k] * scale
+            out[3 * p + 1] = data[k + 1] * scale
+            out[3 * p + 2] = data[k + 2] * scale
+        return fb
+
+    def flush(self) -> None:
+        if self.path is not None:
+            self.mm.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.data.release()
+        self.mm.close()
@@ -0,0 +1,89 @@
+from color import Color, luminance
+from framebuffer import Framebuffer
+from hittable import HitRecord
+
+
+class AOVBuffers:
+    # Auxiliary buffers for the denoiser, averaged over each pixel's samples:
+    # shading normal, albedo and depth of the first diffuse hit. Specular
+    # hits (mirrors, glass) pass through, tinting the albedo, so reflections
+    # keep their edges; depth is always the first hit's distance. A path that
+    # reaches the sky has a zero normal and the tinted sky colour as albedo.
+    # `variance` is the variance of the pixel's mean luminance, i.e. the
+    # sample variance divided by the sample count. Scalars are stored in all
+    # three channels so every buffer can be written like an image.
+    normal: Framebuffer
+    albedo: Framebuffer
+    depth: Framebuffer
+    variance: Framebuffer
+    # True until the sample being traced reaches a diffuse hit or the sky
+    pending: bool
+
+    def __init__(self, width: int, height: int) -> None:
+        self.normal = Framebuffer(width, height)
+        self.albedo = Framebuffer(width, height)
+        self.depth = Framebuffer(width, height)
+        self.variance = Framebuffer(width, height)
+        self.start_pixel()
+        self.start_sample()
+
+    def start_sample(self) -> None:
+        self.pending = True
+        self.hit = [0.0] * 7
+        self.tint = (1.0, 1.0, 1.0)
+
+    def record_hit(self, rec: HitRecord) -> None:
+        # Copy out the values: records and their vectors get reused
+        hit = self.hit
+        n = rec.normal
+        a = rec.mat.albedo
+        if hit[6] == 0.0:
+            hit[0], hit[1], hit[2], hit[6] = n.x, n.y, n.z, rec.t
+        tr, tg, tb = self.tint
+        self.tint = (tr * a.x, tg * a.y, tb * a.z)
+        if not rec.mat.specular:
+            hit[0], hit[1], hit[2] = n.x, n.y, n.z
+            self.pending = False
+
+    def record_miss(self, sky: Color) -> None:
+        hit = self.hit
+        hit[0] = hit[1] = hit[2] = 0.0
+        tr, tg, tb = self.tint
+        self.tint = (tr * sky.x, tg * sky.y, tb * sky.z)
+        self.pending = False
+
+    def start_pixel(self) -> None:
+        self.sums = [0.0] * 7
+        self.lum = 0.0
+        self.lum2 = 0.0
+        self.n = 0
+
+    def add_sample(self, color: Color) -> None:
+        # Call after each sample is traced
+        sums = self.sums
+        hit = self.hit
+        hit[3], hit[4], hit[5] = self.tint
+        for k, v in enumerate(hit):
+            sums[k] += v
+        lum = luminance(color)
+        self.lum += lum
+        self.lum2 += lum * lum
+        self.n += 1
+        self.start_sample()
+
+    def finish_pixel(self, i: int, j: int) -> None:
+        n = self.n
+        if n:
+            s = [v / n for v in self.sums]
+            self.normal.set_pixel(i, j, Color(s[0], s[1], s[2]))
+            self.albedo.set_pixel(i, j, Color(s[3], s[4], s[5]))
+            self.depth.set_pixel(i, j, Color(s[6], s[6], s[6]))
+            mean = self.lum / n
+            var = max(0.0, self.lum2 / n - mean * mean) / max(1, n - 1)
+            self.variance.set_pixel(i, j, Color(var, var, var))
+        self.start_pixel()
+
+    def write(self, prefix: str) -> None:
+        # Writes PREFIX_normal.pfm, PREFIX_albedo.pfm and so on
+        for name in ("normal", "albedo", "depth", "variance"):
+            getattr(self, name).write(f"{prefix}_{name}.pfm")
@@ -0,0 +1,199 @@
+"""
+Batch rendering: many cameras, one world
+
+The world (and any BVH or SphereSet) is built once and every view is rendered
+from it, one frame per worker process at a time. Where the platform can fork,
+workers inherit the world copy-on-write instead of unpickling their own copy.
+
+Camera configurations use the scene file camera keys (see `scene.py`), each
+one laid over the scene's own camera:
+
+    {"cameras": [{"lookfrom": [13, 2, 3], "vfov": 20}, {"lookfrom": [0, 2, 13]}]}
+
+Usage: python batch.py JOBS.json frames/frame_%04d.png [--scene PATH] [--workers N]
+       python batch.py --turntable 36 frames/frame_%04d.png
+"""
+from bvh import BVHNode
+from camera import Camera
+from concurrent.futures import ProcessPoolExecutor
+from hittable import Hittable
+from scene import camera_from_dict, camera_to_dict, load_scene
+from typing import Any, List, Tuple
+from utils import frame_seed
+import argparse
+import gc
+import io
+import json
+import main as scenes
+import math
+import multiprocessing
+import os
+import rng
+import time
+from contextlib import redirect_stdout
+
+# World for the batch workers; set before forking so children share it
+_batch_world: Hittable
+
+
+def load_cameras(path: str, base: Camera) -> List[Camera]:
+    with open(path) as f:
+        jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = jobs["cameras"]
+    base_dict = camera_to_dict(base)
+    return [camera_from_dict({**base_dict, **job}) for job in jobs]
+
+
+def turntable(base: Camera, frames: int) -> List[Camera]:
+    # Orbit `lookfrom` around the vertical axis through `lookat`
+    cameras = []
+    offset = base.lookfrom - base.lookat
+    for n in range(frames):
+        angle = 2 * math.pi * n / frames
+        c, s = math.cos(angle), math.sin(angle)
+        d = camera_to_dict(base)
+        d["lookfrom"] = [
+            base.lookat.x + offset.x * c - offset.z * s,
+            base.lookat.y + offset.y,
+            base.lookat.z + offset.x * s + offset.z * c,
+        ]
+        cameras.append(camera_from_dict(d))
+    return cameras
+
+
+def render_frame(
+    cam: Camera, world: Hittable, frame: int, pattern: str, seed: int | None
+) -> Tuple[str, float]:
+    start = time.perf_counter()
+    cam.seed = seed
+    cam.setup()
+    rng.seed(frame_seed(seed, frame))
+    with redirect_stdout(io.StringIO()):
+        fb = cam.render(world)
+    path = pattern % frame
+    fb.write(path)
+    return path, time.perf_counter() - start
+
+
+def _init_batch_worker(world: Hittable | None) -> None:
+    global _batch_world
+    if world is not None:
+        _batch_world = world
+
+
+def _render_batch_frame(
+    cam: Camera, frame: int, pattern: str, seed: int | None
+) -> Tuple[str, float]:
+    return render_frame(cam, _batch_world, frame, pattern, seed)
+
+
+def render_batch(
+    cameras: List[Camera],
+    world: Hittable,
+    pattern: str,
+    workers: int = 1,
+    seed: int | None = None,
+) -> List[str]:
+    # Renders camera n to `pattern % n`; every frame is seeded on its own,
+    # so the output does not depend on `workers`
+    global _batch_world
+    directory = os.path.dirname(pattern % 0)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if workers <= 1:
+        paths = []
+        for n, cam in enumerate(cameras):
+            path, seconds = render_frame(cam, world, n, pattern, seed)
+            print(f"Frame {n + 1}/{len(cameras)}: {path} in {seconds:.1f}s")
+            paths.append(path)
+        return paths
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Forked workers see the world without pickling it. Freezing moves
+        # it out of the collector's reach, so collections in the children do
+        # not touch (and copy) its pages.
+        _batch_world = world
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+        initargs: Tuple[Any, ...] = (None,)
+    else:
+        context = multiprocessing.get_context()
+        initargs = (world,)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_batch_worker,
+            initargs=initargs,
+        ) as executor:
+            futures = [
+                executor.submit(_render_batch_frame, cam, n, pattern, seed)
+                for n, cam in enumerate(cameras)
+            ]
+            paths = []
+            for n, future in enumerate(futures):
+                path, seconds = future.result()
+                print(f"Frame {n + 1}/{len(cameras)}: {path} in {seconds:.1f}s")
+                paths.append(path)
+            return paths
+    finally:
+        gc.unfreeze()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Render many views of one scene")
+    parser.add_argument("jobs", nargs="?", help="JSON list of camera configurations")
+    parser.add_argument("pattern", help="Output path with a frame number: f%%03d.png")
+    parser.add_argument("--scene", help="Scene file; defaults to the main.py scene")
+    parser.add_argument("--turntable", type=int, metavar="FRAMES", help="Orbit views")
+    parser.add_argument("--width", type=int, help="Override every view's width")
+    parser.add_argument("--samples", type=int, help="Override every view's spp")
+    parser.add_argument("--bvh", action="store_true", help="Build a BVH once")
+    parser.add_argument(
+        "--sphere-set",
+        type=float,
+        nargs="?",
+        const=1.0,
+        metavar="MAX_RADIUS",
+        help="Collapse spheres up to MAX_RADIUS (default 1) into one SphereSet",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Frames in parallel")
+    parser.add_argument("--seed", type=int, help="Seed for scene and sampling")
+    args = parser.parse_args()
+    if bool(args.jobs) == bool(args.turntable):
+        parser.error("give either a jobs file or --turntable")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    rng.seed(args.seed)
+    if args.scene:
+        world, base = load_scene(args.scene, args.sphere_set)
+    else:
+        world, base = scenes.random_scene(), scenes.scene_camera()
+    if args.sphere_set is not None and not args.scene:
+        from sphereset import collapse
+
+        world = collapse(world, args.sphere_set)
+    scene: Hittable = BVHNode(world) if args.bvh else world
+
+    if args.turntable:
+        cameras = turntable(base, args.turntable)
+    else:
+        cameras = load_cameras(args.jobs, base)
+    for cam in cameras:
+        if args.width:
+            cam.image_width = args.width
+        if args.samples:
+            cam.samples_per_pixel = args.samples
+
+    start = time.perf_counter()
+    render_batch(cameras, scene, args.pattern, args.workers, args.seed)
+    print(f"{len(cameras)} frames in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
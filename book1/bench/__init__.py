@@ -0,0 +1,5 @@
+"""
+Renderer benchmarks
+
+Run from the book1 directory, e.g. `python -m bench --json results.json`.
+"""
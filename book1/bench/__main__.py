@@ -0,0 +1,66 @@
+"""
+Run the benchmarks, write JSON results and compare against a baseline
+"""
+import argparse
+import json
+import platform
+from typing import Dict
+from bench import micro, macro
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> bool:
+    # Throughput metrics must not drop by more than `threshold`
+    ok = True
+    print(f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, value in sorted(results.items()):
+        if not key.endswith("_per_sec") or key not in baseline:
+            continue
+        change = value / baseline[key] - 1
+        regressed = change < -threshold
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{key:<52} {baseline[key]:>12.1f} {value:>12.1f} {change:>+7.1%}{flag}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--micro", action="store_true", help="Only run micro-benchmarks")
+    parser.add_argument("--macro", action="store_true", help="Only run macro-benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against results in this file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Allowed relative slowdown before failing (default 0.1)",
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, float] = {}
+    if not args.macro:
+        results.update(micro.run(args.seed))
+    if not args.micro:
+        results.update(macro.run(args.seed))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "results": results}, f, indent=2
+            )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+    else:
+        for key, value in sorted(results.items()):
+            print(f"{key:<52} {value:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare HittableList and BVHNode intersection cost as the scene grows
+"""
+import argparse
+import random
+import time
+from bvh import BVHNode
+from color import Color
+from hittable import HitRecord, Hittable, HittableList
+from interval import Interval
+from material import Lambertian
+from ray import Ray
+from sphere import Sphere
+from vec3 import Point3, random_unit_vector
+from typing import List
+
+
+def make_world(n: int) -> HittableList:
+    # Small spheres scattered over a ground plane, like the main.py scene
+    world = HittableList()
+    mat = Lambertian(Color(0.5, 0.5, 0.5))
+    side = max(1.0, n**0.5)
+    for _ in range(n):
+        center = Point3(
+            random.uniform(-side, side), 0.2, random.uniform(-side, side)
+        )
+        world.add(Sphere(center, 0.2, mat))
+    return world
+
+
+def make_rays(n: int, side: float) -> List[Ray]:
+    rays = []
+    for _ in range(n):
+        origin = Point3(random.uniform(-side, side), 2, random.uniform(-side, side))
+        direction = random_unit_vector()
+        direction.y = -abs(direction.y)
+        rays.append(Ray(origin, direction))
+    return rays
+
+
+def time_hits(world: Hittable, rays: List[Ray]) -> float:
+    rec = HitRecord()
+    start = time.perf_counter()
+    for r in rays:
+        world.hit(r, Interval(0.001, float("inf")), rec)
+    return (time.perf_counter() - start) / len(rays)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--rays", type=int, default=200)
+    parser.add_argument("--split", choices=["sah", "median"], default="sah")
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'spheres':>8} {'build s':>8} {'list us/ray':>12} {'bvh us/ray':>11} {'speedup':>8}")
+    for n in args.sizes:
+        world = make_world(n)
+        rays = make_rays(args.rays, max(1.0, n**0.5))
+
+        start = time.perf_counter()
+        bvh = BVHNode(world, args.split)
+        build = time.perf_counter() - start
+
+        # The linear list gets slow quickly, so cap its ray count
+        t_list = time_hits(world, rays[: max(10, args.rays * 500 // n)])
+        t_bvh = time_hits(bvh, rays)
+        print(
+            f"{n:>8} {build:>8.2f} {t_list * 1e6:>12.1f} {t_bvh * 1e6:>11.1f}"
+            f" {t_list / t_bvh:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
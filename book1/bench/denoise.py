@@ -0,0 +1,90 @@
+"""
+Denoiser quality and runtime
+
+Renders the main.py scene at a low sample count with first-hit buffers,
+denoises it, and compares the RMSE against a high-spp reference with raw
+renders at higher sample counts. The reference uses the wavefront renderer,
+which is faster at high sample counts. Usage: python -m bench.denoise
+"""
+import argparse
+import io
+import math
+import time
+from contextlib import redirect_stdout
+from typing import List, Tuple
+import rng
+from aov import AOVBuffers
+from denoise import denoise
+from framebuffer import Framebuffer
+from hittable import Hittable
+from sphereset import collapse
+import main as scenes
+
+
+def render(
+    world: Hittable,
+    width: int,
+    spp: int,
+    seed: int,
+    aov: bool = False,
+    wavefront: bool = False,
+) -> Tuple[Framebuffer, AOVBuffers | None, float]:
+    cam = scenes.scene_camera()
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.seed = seed
+    if aov:
+        cam.aov = AOVBuffers(0, 0)
+    cam.setup()
+    rng.seed(seed)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fb = cam.render_wavefront(world) if wavefront else cam.render(world)
+    return fb, cam.aov, time.perf_counter() - start
+
+
+def rmse(a: Framebuffer, b: Framebuffer) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a.data, b.data)) / len(a.data))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=96)
+    parser.add_argument("--spp", type=int, default=16, help="Samples to denoise")
+    parser.add_argument(
+        "--raw-spp", default="16,32,64,100", help="Raw renders to compare"
+    )
+    parser.add_argument("--reference-spp", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write", metavar="PREFIX", help="Also write the images")
+    args = parser.parse_args()
+    raw_counts: List[int] = [int(n) for n in args.raw_spp.split(",")]
+
+    rng.seed(args.seed)
+    world = collapse(scenes.random_scene(), 1.0)
+    reference, _, _ = render(
+        world, args.width, args.reference_spp, args.seed + 1, wavefront=True
+    )
+
+    print(f"{'image':<24}{'render s':>10}{'denoise s':>11}{'rmse':>10}")
+    for spp in raw_counts:
+        fb, _, seconds = render(world, args.width, spp, args.seed)
+        label = f"raw {spp}spp"
+        print(f"{label:<24}{seconds:>10.2f}{'':>11}{rmse(fb, reference):>10.4f}")
+
+    noisy, aov, seconds = render(world, args.width, args.spp, args.seed, aov=True)
+    assert aov is not None
+    start = time.perf_counter()
+    clean = denoise(noisy, aov)
+    elapsed = time.perf_counter() - start
+    label = f"denoised {args.spp}spp"
+    print(f"{label:<24}{seconds:>10.2f}{elapsed:>11.3f}{rmse(clean, reference):>10.4f}")
+
+    if args.write:
+        reference.write(f"{args.write}_reference.png")
+        noisy.write(f"{args.write}_noisy.png")
+        clean.write(f"{args.write}_denoised.png")
+
+
+if __name__ == "__main__":
+    main()
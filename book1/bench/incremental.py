@@ -0,0 +1,91 @@
+"""
+Incremental re-rendering after typical edits
+
+Renders the main.py scene with `IncrementalRenderer`, then applies a series of
+edits (recolour, move, add and remove a small sphere) and for each one prints
+how many tiles were re-rendered and how long it took, next to a full render
+of the edited scene, and checks the two images match.
+Usage: python -m bench.incremental [--width 96] [--samples 4]
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+from typing import Callable, List, Tuple
+import rng
+from bvh import BVHNode
+from color import Color
+from framebuffer import Framebuffer
+from hittable import HittableList
+from incremental import IncrementalRenderer
+from material import Lambertian
+from sphere import Sphere
+from vec3 import Point3
+import main as scenes
+
+
+def full_render(cam, world: HittableList) -> Framebuffer:
+    # Tile by tile, seeded the same way, on a plain BVH
+    cam.setup()
+    scene = BVHNode(world)
+    fb = Framebuffer(cam.image_width, cam.image_height)
+    for n, (x0, y0, x1, y1) in enumerate(cam.tiles()):
+        pixels = iter(cam.render_tile(scene, n))
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                fb.set_pixel(i, j, next(pixels))
+    return fb
+
+
+def edits(world: HittableList) -> List[Tuple[str, Callable[[], None]]]:
+    # The small spheres nearest the middle of the frame
+    small = [s for s in world.objects if isinstance(s, Sphere) and s.radius < 0.5]
+    a, b, c = sorted(small, key=lambda s: abs(s.center.x) + abs(s.center.z))[:3]
+
+    def recolour() -> None:
+        a.mat = Lambertian(Color(0.9, 0.1, 0.1))
+
+    def move() -> None:
+        b.center = b.center + Point3(0.3, 0, 0.3)
+
+    def add() -> None:
+        world.add(Sphere(Point3(2, 0.3, 2), 0.3, Lambertian(Color(0.1, 0.8, 0.2))))
+
+    def remove() -> None:
+        world.objects.remove(c)
+
+    return [("recolour", recolour), ("move", move), ("add", add), ("remove", remove)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=96)
+    parser.add_argument("--samples", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng.seed(args.seed)
+    world = scenes.random_scene()
+    cam = scenes.scene_camera()
+    cam.image_width = args.width
+    cam.samples_per_pixel = args.samples
+    cam.seed = args.seed
+    renderer = IncrementalRenderer(cam, bvh=True)
+
+    print(f"{'edit':<12}{'tiles':>10}{'incremental s':>15}{'full s':>10}{'match':>8}")
+    for name, edit in [("initial", lambda: None)] + edits(world):
+        edit()
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fb = renderer.render(world)
+            incremental = time.perf_counter() - start
+            start = time.perf_counter()
+            reference = full_render(cam, world)
+            full = time.perf_counter() - start
+        tiles = f"{len(renderer.dirty)}/{len(cam.tiles())}"
+        match = "yes" if fb.data == reference.data else "NO"
+        print(f"{name:<12}{tiles:>10}{incremental:>15.2f}{full:>10.2f}{match:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Macro-benchmarks: render the main.py scene at small sizes with a fixed seed
+"""
+import io
+import rng
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Tuple
+from bvh import BVHNode
+from hittable import Hittable
+import main
+
+# (image width, samples per pixel)
+SIZES: List[Tuple[int, int]] = [(32, 4), (64, 4)]
+
+
+def render(
+    width: int,
+    spp: int,
+    seed: int,
+    bvh: bool = False,
+    integrator: str = "recursive",
+    cull: bool = False,
+) -> Dict[str, float]:
+    rng.seed(seed)
+    world = main.random_scene()
+    scene: Hittable = BVHNode(world) if bvh else world
+    cam = main.scene_camera()
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.seed = seed
+    cam.integrator = integrator
+    cam.frustum_cull = cull
+    cam.setup()
+
+    rng.seed(seed)
+    # Keep the scanline progress out of the report
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        cam.render(scene)
+        elapsed = time.perf_counter() - start
+
+    pixels = cam.image_width * cam.image_height
+    return {
+        "seconds": elapsed,
+        "rays_per_sec": pixels * spp / elapsed,
+        "pixels_per_sec": pixels / elapsed,
+    }
+
+
+def run(seed: int = 0) -> Dict[str, float]:
+    results = {}
+    for width, spp in SIZES:
+        for suffix, bvh, integrator, cull in (
+            ("", False, "recursive", False),
+            ("_bvh", True, "recursive", False),
+            # Iterative integrator with Russian roulette
+            ("_bvh_rr", True, "iterative", False),
+            # Primary rays against per-tile frustum candidates
+            ("_cull", False, "recursive", True),
+            ("_bvh_cull", True, "recursive", True),
+        ):
+            name = f"macro.render_{width}px_{spp}spp{suffix}"
+            stats = render(width, spp, seed, bvh, integrator, cull)
+            for key, value in stats.items():
+                results[f"{name}.{key}"] = value
+    return results
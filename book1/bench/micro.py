@@ -0,0 +1,79 @@
+"""
+Micro-benchmarks for the per-ray hot paths
+"""
+import rng
+import time
+from typing import Callable, Dict
+from array import array
+from color import Color, tonemap
+from hittable import HitRecord
+from interval import Interval
+from material import Lambertian, Metal, Dielectric, Material
+from ray import Ray
+from sphere import Sphere
+from vec3 import Point3, Vec3, random_unit_vector
+import main
+
+# Each benchmark runs REPEAT rounds of at least MIN_TIME seconds and reports
+# the best round, which is the least disturbed by other processes
+MIN_TIME = 0.2
+REPEAT = 3
+
+
+def ops_per_sec(fn: Callable[[], object], batch: int = 1000) -> float:
+    best = 0.0
+    for _ in range(REPEAT):
+        n = 0
+        start = time.perf_counter()
+        while True:
+            for _ in range(batch):
+                fn()
+            n += batch
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_TIME:
+                break
+        best = max(best, n / elapsed)
+    return best
+
+
+def scatter_bench(mat: Material) -> Callable[[], object]:
+    r_in = Ray(Point3(0, 0, 2), Vec3(0.1, -0.2, -1))
+    rec = HitRecord()
+    rec.p = Point3(0, 0, 1)
+    rec.normal = Vec3(0, 0, 1)
+    rec.front_face = True
+    rec.mat = mat
+
+    def fn() -> bool:
+        return mat.scatter(r_in, rec, Color(), Ray())
+
+    return fn
+
+
+def run(seed: int = 0) -> Dict[str, float]:
+    rng.seed(seed)
+    world = main.random_scene()
+    sphere = Sphere(Point3(0, 0, -1), 0.5, Lambertian(Color(0.5, 0.5, 0.5)))
+    hit_ray = Ray(Point3(0, 0, 0), Vec3(0, 0, -1))
+    world_ray = Ray(Point3(13, 2, 3), Vec3(-13, -2, -3))
+    rec = HitRecord()
+    buffer = array("d", [rng.random() for _ in range(3 * 64 * 64)])
+
+    benchmarks: Dict[str, Callable[[], object]] = {
+        "sphere_hit": lambda: sphere.hit(hit_ray, Interval(0.001, float("inf")), rec),
+        "hittable_list_hit": lambda: world.hit(
+            world_ray, Interval(0.001, float("inf")), rec
+        ),
+        "lambertian_scatter": scatter_bench(Lambertian(Color(0.5, 0.5, 0.5))),
+        "metal_scatter": scatter_bench(Metal(Color(0.7, 0.6, 0.5), 0.3)),
+        "dielectric_scatter": scatter_bench(Dielectric(1.5)),
+        "random_unit_vector": random_unit_vector,
+        # Replaces the old per-pixel get_color; one call tone-maps 64x64 pixels
+        "tonemap_64x64": lambda: tonemap(buffer),
+    }
+
+    results = {}
+    for name, fn in benchmarks.items():
+        batch = 10 if name in ("hittable_list_hit", "tonemap_64x64") else 1000
+        results[f"micro.{name}.ops_per_sec"] = ops_per_sec(fn, batch)
+    return results
@@ -0,0 +1,319 @@
+"""
+Quality versus time for renderer configurations
+
+Renders each scene once at a very high sample count as the reference (with the
+scalar recursive integrator, tiled over every CPU, and cached on disk, so later
+runs reuse it), then renders every configuration at a series of sample counts
+and reports wall time, camera rays per second, RMSE and PSNR against the
+reference. Two summary tables follow, measured against the first
+configuration:
+
+- equal time: the error each configuration reaches in the time the first one
+  takes at its highest sample count
+- equal quality: the time each configuration needs to reach the first one's
+  error there, and the speedup that gives
+
+Both are interpolated on each configuration's log-log error curve, marked *
+where extrapolated. `slope` is the fitted exponent of RMSE against spp: an
+unbiased Monte Carlo estimator converges at about -0.5, and a slope that
+flattens as spp grows means error the samples cannot remove, i.e. bias.
+
+Configurations are presets (see CONFIGS) or NAME=JSON with the keys of CONFIGS.
+Usage: python -m bench.quality [--scene main,diffuse] [--config random,sobol]
+       python -m bench.quality --config 'random,deep={"max_depth": 100}'
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import time
+from array import array
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Tuple
+import rng
+from aov import AOVBuffers
+from bvh import BVHNode
+from camera import Camera
+from color import Color
+from framebuffer import Framebuffer
+from hittable import Hittable, HittableList
+from material import Dielectric, Lambertian, Metal
+from scene import camera_from_dict, camera_to_dict, to_arrays
+from service import ResultCache
+from sphere import Sphere
+from vec3 import Point3
+import main as scenes
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".quality-cache")
+CACHE_BYTES = 256 * 10**6
+# Part of the reference cache key. References come from the plain scalar path
+# rather than any configuration under test, so none is judged against its own
+# output.
+REFERENCE_RENDERER = "scalar-recursive"
+
+# Render settings, all optional: sampling, integrator, rr_depth (None turns
+# Russian roulette off), max_depth, bvh, sphere_set, adaptive (tolerance,
+# with spp as the cap), wavefront and denoise
+CONFIGS: Dict[str, Dict[str, Any]] = {
+    "random": {},
+    "stratified": {"sampling": "stratified"},
+    "sobol": {"sampling": "sobol"},
+    "iterative": {"integrator": "iterative", "rr_depth": None},
+    "roulette": {"integrator": "iterative", "rr_depth": 3},
+    "roulette-1": {"integrator": "iterative", "rr_depth": 1},
+    "bvh": {"bvh": True},
+    "sphere-set": {"sphere_set": True, "bvh": True},
+    "adaptive": {"adaptive": 0.05, "bvh": True},
+    "denoise": {"denoise": True, "bvh": True},
+    "wavefront": {"wavefront": True},
+}
+
+
+def diffuse_scene() -> Tuple[HittableList, Camera]:
+    # One grey sphere on a grey floor: interreflection and path termination
+    world = HittableList()
+    grey = Lambertian(Color(0.5, 0.5, 0.5))
+    world.add(Sphere(Point3(0, -1000, 0), 1000, grey))
+    world.add(Sphere(Point3(0, 1, 0), 1, Lambertian(Color(0.7, 0.3, 0.3))))
+    cam = Camera()
+    cam.lookfrom = Point3(0, 2, 6)
+    cam.lookat = Point3(0, 0.8, 0)
+    cam.vfov = 40
+    return world, cam
+
+
+def glass_scene() -> Tuple[HittableList, Camera]:
+    # Solid and hollow glass in front of coloured spheres: long specular paths
+    world = HittableList()
+    world.add(Sphere(Point3(0, -1000, 0), 1000, Lambertian(Color(0.5, 0.5, 0.5))))
+    world.add(Sphere(Point3(-1.1, 0.5, 0), 0.5, Dielectric(1.5)))
+    world.add(Sphere(Point3(0, 0.5, 0), 0.5, Dielectric(1.5)))
+    world.add(Sphere(Point3(0, 0.5, 0), -0.45, Dielectric(1.5)))
+    world.add(Sphere(Point3(1.1, 0.5, 0), 0.5, Lambertian(Color(0.1, 0.2, 0.5))))
+    world.add(Sphere(Point3(0, 0.5, -2), 0.5, Lambertian(Color(0.8, 0.6, 0.2))))
+    cam = Camera()
+    cam.lookfrom = Point3(0, 1, 4)
+    cam.lookat = Point3(0, 0.5, 0)
+    cam.vfov = 40
+    return world, cam
+
+
+def metal_scene() -> Tuple[HittableList, Camera]:
+    # Mirror and fuzzy metal facing each other: many bounces between them
+    world = HittableList()
+    world.add(Sphere(Point3(0, -1000, 0), 1000, Lambertian(Color(0.4, 0.5, 0.4))))
+    world.add(Sphere(Point3(-1, 1, 0), 1, Metal(Color(0.8, 0.8, 0.8), 0.0)))
+    world.add(Sphere(Point3(1, 1, 0), 1, Metal(Color(0.8, 0.6, 0.2), 0.3)))
+    world.add(Sphere(Point3(0, 0.4, 1.5), 0.4, Lambertian(Color(0.8, 0.2, 0.2))))
+    cam = Camera()
+    cam.lookfrom = Point3(0, 1.5, 6)
+    cam.lookat = Point3(0, 0.8, 0)
+    cam.vfov = 35
+    return world, cam
+
+
+def main_scene() -> Tuple[HittableList, Camera]:
+    rng.seed(0)
+    return scenes.random_scene(), scenes.scene_camera()
+
+
+SCENES: Dict[str, Callable[[], Tuple[HittableList, Camera]]] = {
+    "main": main_scene,
+    "diffuse": diffuse_scene,
+    "glass": glass_scene,
+    "metal": metal_scene,
+}
+
+
+def render(
+    world: HittableList, base: Camera, width: int, spp: int, seed: int, config: Dict
+) -> Tuple[Framebuffer, float, int]:
+    # Returns the image, wall time and camera rays traced. Building a BVH or
+    # SphereSet counts towards the time, as it would in production.
+    cam = camera_from_dict(camera_to_dict(base))
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.seed = seed
+    cam.sampling = config.get("sampling", "random")
+    cam.integrator = config.get("integrator", "recursive")
+    cam.rr_min_depth = config.get("rr_depth", 3)
+    cam.max_depth = config.get("max_depth", cam.max_depth)
+    if config.get("denoise"):
+        cam.aov = AOVBuffers(0, 0)
+    cam.setup()
+    rng.seed(seed)
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        scene: Hittable = world
+        if config.get("sphere_set"):
+            from sphereset import collapse
+
+            scene = collapse(world, 1.0)
+        if config.get("bvh"):
+            scene = BVHNode(scene)
+        if config.get("wavefront"):
+            fb = cam.render_wavefront(scene)
+        elif config.get("adaptive") is not None:
+            cam.adaptive_tolerance = config["adaptive"]
+            fb = cam.render_adaptive(scene)
+        else:
+            fb = cam.render(scene)
+        if cam.aov is not None:
+            from denoise import denoise
+
+            fb = denoise(fb, cam.aov)
+        elapsed = time.perf_counter() - start
+
+    if config.get("adaptive") is not None:
+        rays = sum(cam.sample_counts)
+    else:
+        rays = cam.image_width * cam.image_height * spp
+    return fb, elapsed, rays
+
+
+def reference(
+    name: str, world: HittableList, cam: Camera, width: int, spp: int, seed: int
+) -> Framebuffer:
+    materials, centers, radii, mat_index = to_arrays(world)
+    key = hashlib.sha256(
+        json.dumps(
+            [REFERENCE_RENDERER, name, materials, list(centers), list(radii)]
+            + [list(mat_index), camera_to_dict(cam), width, spp, seed],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+    cache = ResultCache(CACHE_DIR, CACHE_BYTES)
+    cam.image_width = width
+    cam.setup()
+    fb = Framebuffer(cam.image_width, cam.image_height)
+
+    data = cache.get(key)
+    if data is not None:
+        fb.data = array("d", data)
+        return fb
+    print(f"Rendering the {name} reference at {spp} spp...")
+    ref_cam = camera_from_dict(camera_to_dict(cam))
+    ref_cam.image_width = width
+    ref_cam.samples_per_pixel = spp
+    ref_cam.seed = seed
+    ref_cam.workers = os.cpu_count() or 1
+    ref_cam.setup()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        fb = ref_cam.render_parallel(BVHNode(world))
+    seconds = time.perf_counter() - start
+    print(f"  done in {seconds:.1f}s, cached as {key[:12]}")
+    cache.put(key, fb.data.tobytes())
+    return fb
+
+
+def rmse(a: Framebuffer, b: Framebuffer) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a.data, b.data)) / len(a.data))
+
+
+def psnr(error: float) -> float:
+    # Against a peak of 1.0, i.e. white in linear colour
+    return 20 * math.log10(1 / error) if error > 0 else math.inf
+
+
+def interpolate(xs: List[float], ys: List[float], x: float) -> Tuple[float, bool]:
+    # y at x on the log-log polyline through (xs, ys), extending the end
+    # segments; also says whether x was outside the measured range
+    points = sorted(zip(xs, ys))
+    lx = math.log(x)
+    k = 1
+    while k < len(points) - 1 and math.log(points[k][0]) < lx:
+        k += 1
+    (x0, y0), (x1, y1) = points[k - 1], points[k]
+    if x0 == x1:
+        return y0, False
+    f = (lx - math.log(x0)) / (math.log(x1) - math.log(x0))
+    y = math.exp(math.log(y0) + f * (math.log(y1) - math.log(y0)))
+    return y, not points[0][0] <= x <= points[-1][0]
+
+
+def slope(xs: List[float], ys: List[float]) -> float:
+    # Least-squares slope of log y against log x
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(y) for y in ys]
+    mx = sum(lx) / len(lx)
+    my = sum(ly) / len(ly)
+    den = sum((a - mx) ** 2 for a in lx)
+    return sum((a - mx) * (b - my) for a, b in zip(lx, ly)) / den if den else 0.0
+
+
+def parse_configs(text: str) -> Dict[str, Dict[str, Any]]:
+    configs = {}
+    for item in text.split(","):
+        name, _, spec = item.partition("=")
+        configs[name] = json.loads(spec) if spec else CONFIGS[name]
+    return configs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scene", default="main", help=f"Any of {', '.join(SCENES)}")
+    parser.add_argument("--config", default="random,sobol,roulette,bvh,adaptive")
+    parser.add_argument("--spp", default="4,16,64", help="Comma-separated counts")
+    parser.add_argument("--width", type=int, default=48)
+    parser.add_argument("--reference-spp", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = [int(n) for n in args.spp.split(",")]
+    configs = parse_configs(args.config)
+    baseline = next(iter(configs))
+
+    for scene_name in args.scene.split(","):
+        world, cam = SCENES[scene_name]()
+        # A different seed keeps the reference independent of the runs
+        ref = reference(
+            scene_name, world, cam, args.width, args.reference_spp, args.seed + 1
+        )
+
+        print(f"\n{scene_name} ({args.width}px, reference {args.reference_spp} spp)")
+        print(
+            f"{'config':<14}{'spp':>6}{'seconds':>10}{'rays/s':>10}"
+            f"{'rmse':>10}{'psnr':>8}"
+        )
+        curves: Dict[str, Tuple[List[float], List[float], List[int]]] = {}
+        for name, config in configs.items():
+            times, errors = [], []
+            for spp in counts:
+                fb, seconds, rays = render(
+                    world, cam, args.width, spp, args.seed, config
+                )
+                error = rmse(fb, ref)
+                times.append(seconds)
+                errors.append(error)
+                print(
+                    f"{name:<14}{spp:>6}{seconds:>10.2f}{rays / seconds:>10.0f}"
+                    f"{error:>10.4f}{psnr(error):>8.2f}"
+                )
+            curves[name] = (times, errors, counts)
+
+        budget = curves[baseline][0][-1]
+        target = curves[baseline][1][-1]
+        print(
+            f"\nequal time ({budget:.2f}s) and equal quality "
+            f"(rmse {target:.4f}), against {baseline}"
+        )
+        print(
+            f"{'config':<14}{'rmse':>10}{'psnr':>8}{'seconds':>11}"
+            f"{'speedup':>9}{'slope':>8}"
+        )
+        for name, (times, errors, spps) in curves.items():
+            error, outside_t = interpolate(times, errors, budget)
+            # Time as a function of error: flip the curve around
+            seconds, outside_e = interpolate(errors, times, target)
+            print(
+                f"{name:<14}{error:>9.4f}{'*' if outside_t else ' '}"
+                f"{psnr(error):>8.2f}{seconds:>10.2f}{'*' if outside_e else ' '}"
+                f"{budget / seconds:>8.2f}x{slope(spps, errors):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Noise-vs-spp curves for the pixel samplers
+
+Renders the main.py scene once at a high sample count as the reference, then at
+increasing sample counts with each sampler, and prints the RMSE against the
+reference. Usage: python -m bench.sampling [--width 32] [--reference-spp 1024]
+"""
+import argparse
+import io
+import math
+import rng
+from contextlib import redirect_stdout
+from typing import List
+from framebuffer import Framebuffer
+from hittable import Hittable
+from sampler import SAMPLERS
+from sphereset import collapse
+import main as scenes
+
+
+def render(
+    world: Hittable, width: int, spp: int, sampling: str, seed: int
+) -> Framebuffer:
+    cam = scenes.scene_camera()
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.sampling = sampling
+    cam.seed = seed
+    cam.setup()
+    rng.seed(seed)
+    with redirect_stdout(io.StringIO()):
+        return cam.render(world)
+
+
+def rmse(a: Framebuffer, b: Framebuffer) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a.data, b.data)) / len(a.data))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=32)
+    parser.add_argument("--reference-spp", type=int, default=1024)
+    parser.add_argument("--spp", default="1,4,16,64", help="Comma-separated counts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts: List[int] = [int(n) for n in args.spp.split(",")]
+
+    rng.seed(args.seed)
+    # Sampling only changes the camera side, so share one fast world
+    world = collapse(scenes.random_scene(), 1.0)
+    # A different seed keeps the reference independent of the curves
+    reference = render(world, args.width, args.reference_spp, "sobol", args.seed + 1)
+
+    print(f"{'sampler':<12}" + "".join(f"{n:>10}spp" for n in counts))
+    for name in SAMPLERS:
+        errors = [
+            rmse(render(world, args.width, n, name, args.seed), reference)
+            for n in counts
+        ]
+        print(f"{name:<12}" + "".join(f"{e:>13.4f}" for e in errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Startup benchmark: write and load a large binary scene file
+"""
+import argparse
+import os
+import pickle
+import random
+import tempfile
+import time
+from array import array
+from color import Color
+from hittable import HittableList
+from material import Lambertian
+from scene import camera_to_dict, from_arrays, read_arrays, write_binary
+from sphere import Sphere
+from vec3 import Point3
+import main as scenes
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - start:>8.2f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spheres", type=int, default=1_000_000)
+    args = parser.parse_args()
+    n = args.spheres
+
+    random.seed(0)
+    side = n**0.5
+    centers = array("d")
+    for _ in range(n):
+        centers.extend((random.uniform(-side, side), 0.2, random.uniform(-side, side)))
+    radii = array("d", [0.2]) * n
+    materials = [
+        {"type": "lambertian", "albedo": [random.random(), random.random(), random.random()]}
+        for _ in range(16)
+    ]
+    mat_index = array("I", [random.randrange(16) for _ in range(n)])
+
+    fd, path = tempfile.mkstemp(suffix=".rtscene")
+    os.close(fd)
+    try:
+        camera = camera_to_dict(scenes.scene_camera())
+        timed(
+            f"write {n} spheres",
+            lambda: write_binary(path, camera, materials, centers, radii, mat_index),
+        )
+        print(f"{'file size':<40} {os.path.getsize(path) / 1e6:>7.1f}MB")
+        loaded = timed("read arrays", lambda: read_arrays(path))
+        world = timed("build HittableList (bulk)", lambda: from_arrays(*loaded[1:]))
+        timed(
+            "build SphereSet (bulk, needs NumPy)",
+            lambda: from_arrays(*loaded[1:], sphere_set=1.0),
+        )
+
+        def per_object() -> HittableList:
+            # What main.main() used to do: one add() per sphere
+            mats = [Lambertian(Color(*m["albedo"])) for m in materials]
+            w = HittableList()
+            for k in range(n):
+                c = Point3(centers[3 * k], centers[3 * k + 1], centers[3 * k + 2])
+                w.add(Sphere(c, radii[k], mats[mat_index[k]]))
+            return w
+
+        timed("build HittableList (add per sphere)", per_object)
+        data = timed("pickle bulk world", lambda: pickle.dumps(world, -1))
+        print(f"{'pickle size':<40} {len(data) / 1e6:>7.1f}MB")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
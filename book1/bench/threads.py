@@ -0,0 +1,86 @@
+"""
+Thread scaling: `Camera.render_threaded` across thread counts
+
+Renders the main.py scene (with a BVH) on 1, 2, 4, ... threads and prints the
+time, rays per second and speedup over one thread, next to
+`Camera.render_parallel` on the same number of processes. Every image is
+checked against the single-thread one. Run it under both a regular and a
+free-threaded interpreter (python3.13t) to compare; only the latter can scale
+threads past one core. Usage: python -m bench.threads [--threads 1,2,4,8]
+"""
+import argparse
+import io
+import os
+import platform
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import List
+import rng
+from bvh import BVHNode
+from camera import Camera
+from framebuffer import Framebuffer
+from hittable import Hittable
+import main as scenes
+
+
+def render(
+    world: Hittable, width: int, spp: int, seed: int, workers: int, mode: str
+) -> Framebuffer:
+    cam: Camera = scenes.scene_camera()
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.seed = seed
+    cam.workers = workers
+    cam.setup()
+    with redirect_stdout(io.StringIO()):
+        if mode == "threads":
+            return cam.render_threaded(world)
+        return cam.render_parallel(world)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma-separated counts")
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--samples", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-processes", action="store_true", help="Skip the process comparison"
+    )
+    args = parser.parse_args()
+    counts: List[int] = [int(n) for n in args.threads.split(",")]
+
+    # `sys._is_gil_enabled` only exists from 3.13 on
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(
+        f"Python {platform.python_version()} ({'GIL' if gil else 'free-threaded'}), "
+        f"{os.cpu_count()} CPUs"
+    )
+
+    rng.seed(args.seed)
+    world = BVHNode(scenes.random_scene())
+    pixels = args.width * int(args.width / scenes.scene_camera().aspect_ratio)
+    modes = ["threads"] if args.no_processes else ["threads", "processes"]
+
+    print(f"{'mode':<12}{'workers':>8}{'seconds':>10}{'rays/s':>10}{'speedup':>9}")
+    reference = None
+    for mode in modes:
+        base = None
+        for n in counts:
+            start = time.perf_counter()
+            fb = render(world, args.width, args.samples, args.seed, n, mode)
+            seconds = time.perf_counter() - start
+            base = base or seconds
+            if reference is None:
+                reference = fb
+            flag = "" if fb.data == reference.data else "  MISMATCH"
+            rays = pixels * args.samples / seconds
+            print(
+                f"{mode:<12}{n:>8}{seconds:>10.2f}{rays:>10.0f}"
+                f"{base / seconds:>8.2f}x{flag}"
+            )
+
+
+if __name__ == "__main__":
+    main()
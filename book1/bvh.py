@@ -0,0 +1,132 @@
+from hittable import Hittable, HittableList
+from aabb import AABB, empty_box
+from ray import Ray
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from stats import RenderStats
+
+# Number of centroid buckets evaluated per split when building with SAH
+SAH_BUCKETS = 12
+
+
+class BVHNode(Hittable):
+    left: Hittable
+    right: Hittable
+    bbox: AABB
+    # Number of children that are primitives rather than nodes
+    leaves: int
+    stats: "RenderStats | None" = None
+
+    def __init__(self, objects: List[Hittable] | HittableList, split: str = "sah"):
+        if isinstance(objects, HittableList):
+            objects = objects.objects
+        if not objects:
+            raise ValueError("BVHNode needs at least one object")
+        if split not in ("sah", "median"):
+            raise ValueError(f"Unknown split method: {split}")
+
+        objects = list(objects)
+        self.bbox = empty_box
+        for obj in objects:
+            self.bbox = AABB.surrounding(self.bbox, obj.bounding_box())
+
+        if len(objects) == 1:
+            self.left = self.right = objects[0]
+            self.leaves = 1
+            return
+        if len(objects) == 2:
+            self.left, self.right = objects
+            self.leaves = 2
+            return
+
+        if split == "sah":
+            left, right = sah_split(objects, self.bbox)
+        else:
+            left, right = median_split(objects, self.bbox)
+        self.left = left[0] if len(left) == 1 else BVHNode(left, split)
+        self.right = right[0] if len(right) == 1 else BVHNode(right, split)
+        self.leaves = (len(left) == 1) + (len(right) == 1)
+
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        if self.stats is not None:
+            self.stats.bbox_tests += 1
+        if not self.bbox.hit_range(r, t_min, t_max):
+            return None
+        if self.stats is not None:
+            self.stats.intersection_tests += self.leaves
+
+        left = self.left.intersect(r, t_min, t_max)
+        if self.right is self.left:
+            return left
+        # Only accept hits on the right that are closer than the left one
+        right = self.right.intersect(r, t_min, t_max if left is None else left[0])
+        return left if right is None else right
+
+    def bounding_box(self) -> AABB:
+        return self.bbox
+
+
+def median_split(
+    objects: List[Hittable], bbox: AABB
+) -> Tuple[List[Hittable], List[Hittable]]:
+    # Split the object list in half along the longest axis of the node
+    axis = bbox.longest_axis()
+    objects.sort(key=lambda obj: obj.bounding_box().centroid(axis))
+    mid = len(objects) // 2
+    return objects[:mid], objects[mid:]
+
+
+def sah_split(
+    objects: List[Hittable], bbox: AABB
+) -> Tuple[List[Hittable], List[Hittable]]:
+    # Binned surface area heuristic along the axis with the widest centroid spread
+    centroids = [
+        (
+            obj.bounding_box().centroid(0),
+            obj.bounding_box().centroid(1),
+            obj.bounding_box().centroid(2),
+        )
+        for obj in objects
+    ]
+    spreads = [
+        max(c[axis] for c in centroids) - min(c[axis] for c in centroids)
+        for axis in range(3)
+    ]
+    axis = spreads.index(max(spreads))
+    if spreads[axis] <= 0:
+        return median_split(objects, bbox)
+
+    lo = min(c[axis] for c in centroids)
+    scale = SAH_BUCKETS / spreads[axis]
+    buckets: List[List[Hittable]] = [[] for _ in range(SAH_BUCKETS)]
+    boxes = [empty_box] * SAH_BUCKETS
+    for obj, c in zip(objects, centroids):
+        b = min(int((c[axis] - lo) * scale), SAH_BUCKETS - 1)
+        buckets[b].append(obj)
+        boxes[b] = AABB.surrounding(boxes[b], obj.bounding_box())
+
+    # Sweep from both sides to get the cost of every bucket boundary
+    right_cost = [0.0] * SAH_BUCKETS
+    box, count = empty_box, 0
+    for b in range(SAH_BUCKETS - 1, 0, -1):
+        box = AABB.surrounding(box, boxes[b])
+        count += len(buckets[b])
+        right_cost[b] = count * box.surface_area()
+
+    best, best_cost = 0, float("inf")
+    box, count = empty_box, 0
+    for b in range(SAH_BUCKETS - 1):
+        box = AABB.surrounding(box, boxes[b])
+        count += len(buckets[b])
+        cost = count * box.surface_area() + right_cost[b + 1]
+        if count and count < len(objects) and cost < best_cost:
+            best, best_cost = b, cost
+
+    left = [obj for bucket in buckets[: best + 1] for obj in bucket]
+    right = [obj for bucket in buckets[best + 1 :] for obj in bucket]
+    if not left or not right:
+        return median_split(objects, bbox)
+    return left, right
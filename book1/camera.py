@@ -1,12 +1,21 @@
 from ray import Ray
 from hittable import Hittable, HitRecord
-from color import Color, get_color
-from vec3 import unit_vector, random_in_unit_disk, cross, Vec3, Point3
-from interval import Interval
-from typing import Generator, Tuple
+from color import Color, luminance
+from framebuffer import Framebuffer
+from vec3 import unit_vector, square_to_unit_disk, cross, Vec3, Point3
+from typing import Callable, List, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from stats import RenderStats, ThreadStats, attach
+import copy
+import frustum
 import math
-import random
-from utils import degrees_to_radians
+import rng
+import threading
+import time
+from utils import degrees_to_radians, tile_seed, pass_seed
+from accumulation import AccumulationBuffer
+from aov import AOVBuffers
+from sampler import PIXEL, LENS, BOUNCE, Sampler, make_sampler
 
 
 class Camera:
@@ -35,6 +44,44 @@ class Camera:
     focus_dist: float = 10
     defocus_disk_v: Vec3
     defocus_disk_u: Vec3
+    seed: int | None = None
+    workers: int = 1
+    tile_size: int = 16
+    # Adaptive sampling: `samples_per_pixel` is the upper cap
+    min_samples_per_pixel: int = 16
+    adaptive_tolerance: float = 0.05
+    sample_counts: List[int]
+    framebuffer: Framebuffer
+    # Opt-in instrumentation; None keeps the hot path free of bookkeeping
+    stats: RenderStats | None = None
+    # "recursive" uses `ray_color`; "iterative" uses `path_color`, with
+    # Russian roulette from bounce `rr_min_depth` on (None disables it)
+    integrator: str = "recursive"
+    rr_min_depth: int | None = 3
+    # Pass-based rendering into an accumulation buffer
+    samples_per_pass: int = 4
+    checkpoint_seconds: float = 60
+    # Progressive rendering starts with one sample per block of
+    # `preview_stride` x `preview_stride` pixels
+    preview_stride: int = 8
+    accumulation: AccumulationBuffer
+    # Sample pattern for the pixel, lens and first-bounce dimensions: one
+    # of "random", "stratified", "halton" or "sobol"
+    sampling: str = "random"
+    sampler: Sampler
+    # First-hit normal, albedo, depth and variance buffers for denoising.
+    # Opt in by setting any `AOVBuffers`; `render` and `render_adaptive`
+    # replace it with fresh buffers of the image size and fill them
+    aov: AOVBuffers | None = None
+    # Per-tile frustum culling: primary rays only test the objects whose
+    # bounds reach into their tile's frustum (see `frustum`). `start_render`
+    # builds the lists for the world it is given, and only that world uses
+    # them; secondary rays always see the whole world
+    frustum_cull: bool = False
+    cull_world: Hittable | None = None
+    tile_worlds: List[Hittable]
+    tiles_across: int
+    primary_world: Hittable
 
     def setup(self) -> None:
         # Force image height to be at least 1
@@ -75,49 +122,532 @@ class Camera:
         self.defocus_disk_u = self.u * defocus_radius
         self.defocus_disk_v = self.v * defocus_radius
 
+        self.sampler = make_sampler(self.sampling, self.seed, self.samples_per_pixel)
+
     def pixel_sample_square(self) -> Vec3:
-        px = -0.5 + random.random()
-        py = -0.5 + random.random()
-        return (px * self.px_delta_u) + (py * self.px_delta_u)
+        u, v = self.sampler.get_2d(PIXEL)
+        return ((u - 0.5) * self.px_delta_u).add_scaled(self.px_delta_v, v - 0.5)
 
     def get_ray(self, i: int, j: int) -> Ray:
-        px_center = self.px00_loc + (i * self.px_delta_u) + (j * self.px_delta_v)
-        px_sample = px_center + self.pixel_sample_square()
+        # Starts the next sample of the pixel set up by `sampler.start_pixel`
+        if self.stats is not None:
+            self.stats.primary_rays += 1
+        self.sampler.next_sample()
+        if self.cull_world is not None:
+            size = self.tile_size
+            self.primary_world = self.tile_worlds[
+                (j // size) * self.tiles_across + i // size
+            ]
+        # Build the sample point in place: one vector instead of five
+        px_sample = self.px00_loc.copy()
+        px_sample.add_scaled(self.px_delta_u, i).add_scaled(self.px_delta_v, j)
+        px_sample += self.pixel_sample_square()
         ray_origin = (
             self.defocus_disk_sample() if self.defocus_angle > 0 else self.center
         )
-        ray_direction = px_sample - ray_origin
-        return Ray(ray_origin, ray_direction)
+        px_sample -= ray_origin
+        return Ray(ray_origin, px_sample)
+
+    def start_render(self, world: Hittable) -> None:
+        self.framebuffer = Framebuffer(self.image_width, self.image_height)
+        if self.aov is not None:
+            self.aov = AOVBuffers(self.image_width, self.image_height)
+        self.cull_world = None
+        if self.frustum_cull:
+            self.tile_worlds = frustum.tile_worlds(self, world)
+            self.tiles_across = -(-self.image_width // self.tile_size)
+            self.cull_world = world
+        self.attach_stats(world, self.stats)
 
-    def render(
-        self, world: Hittable
-    ) -> Generator[Tuple[float, float, float], None, None]:
+    def attach_stats(self, world: Hittable, stats: RenderStats | None) -> None:
+        # Point `world` and the culling lists built for it at `stats`
+        attach(world, stats)
+        if self.cull_world is world:
+            for tile_world in self.tile_worlds:
+                attach(tile_world, stats)
+
+    def render(self, world: Hittable) -> Framebuffer:
+        self.start_render(world)
+        aov = self.aov
+        scale = 1.0 / self.samples_per_pixel
         for j in range(self.image_height):
             print(f"Scanlines remaining: {(self.image_height - 1) - j} ", end="\r")
+            start = time.perf_counter()
             for i in range(self.image_width):
                 px_color = Color(0, 0, 0)
+                self.sampler.start_pixel(i, j)
                 # Apply anti-aliasing
                 for _ in range(self.samples_per_pixel):
                     r = self.get_ray(i, j)
-                    px_color += self.ray_color(r, self.max_depth, world)
-                yield get_color(px_color, self.samples_per_pixel)
+                    sample = self.sample_color(r, world)
+                    px_color += sample
+                    if aov is not None:
+                        aov.add_sample(sample)
+                self.framebuffer.set_pixel(i, j, px_color * scale)
+                if aov is not None:
+                    aov.finish_pixel(i, j)
+            if self.stats is not None:
+                self.stats.scanline_seconds.append(time.perf_counter() - start)
+        return self.framebuffer
+
+    def render_adaptive(self, world: Hittable) -> Framebuffer:
+        # Keep sampling a pixel until the 95% confidence interval of its
+        # luminance is within `adaptive_tolerance` of the mean
+        self.start_render(world)
+        self.sample_counts = []
+        z2 = 1.96 * 1.96
+        tolerance2 = self.adaptive_tolerance * self.adaptive_tolerance
+        # The variance needs two samples; a cap of one just takes one
+        min_samples = max(2, min(self.min_samples_per_pixel, self.samples_per_pixel))
+        aov = self.aov
+        for j in range(self.image_height):
+            print(f"Scanlines remaining: {(self.image_height - 1) - j} ", end="\r")
+            start = time.perf_counter()
+            for i in range(self.image_width):
+                px_color = Color(0, 0, 0)
+                self.sampler.start_pixel(i, j)
+                mean = 0.0
+                m2 = 0.0
+                n = 0
+                while n < self.samples_per_pixel:
+                    r = self.get_ray(i, j)
+                    sample = self.sample_color(r, world)
+                    px_color += sample
+                    n += 1
+                    if aov is not None:
+                        aov.add_sample(sample)
+
+                    # Welford's running mean and variance
+                    lum = luminance(sample)
+                    delta = lum - mean
+                    mean += delta / n
+                    m2 += delta * (lum - mean)
+
+                    if n >= min_samples:
+                        variance = m2 / (n - 1)
+                        if z2 * variance / n <= tolerance2 * (mean * mean + 1e-6):
+                            break
+                self.sample_counts.append(n)
+                self.framebuffer.set_pixel(i, j, px_color / n)
+                if aov is not None:
+                    aov.finish_pixel(i, j)
+            if self.stats is not None:
+                self.stats.scanline_seconds.append(time.perf_counter() - start)
+        return self.framebuffer
+
+    def sample_heatmap(self) -> Framebuffer:
+        # Samples spent per pixel by the last `render_adaptive`, from black
+        # (`min_samples_per_pixel`) to red (`samples_per_pixel`)
+        heatmap = Framebuffer(self.image_width, self.image_height)
+        lo = min(self.min_samples_per_pixel, self.samples_per_pixel)
+        span = max(1, self.samples_per_pixel - lo)
+        for k, n in enumerate(self.sample_counts):
+            level = (n - lo) / span
+            heatmap.data[3 * k] = level
+            heatmap.data[3 * k + 1] = level / 16
+        return heatmap
+
+    def render_passes(
+        self,
+        world: Hittable,
+        path: str | None = None,
+        on_pass: Callable[[Framebuffer], None] | None = None,
+    ) -> Framebuffer:
+        # Renders in passes of `samples_per_pass` samples per pixel until every
+        # pixel holds at least `samples_per_pixel` samples. With a path, sums
+        # and counts live in a memory-mapped file that is flushed every
+        # `checkpoint_seconds`: rerunning resumes an interrupted render, and
+        # rerunning with a higher `samples_per_pixel` tops up a finished one.
+        # Every (pass, scanline) is seeded on its own, so the result is the
+        # same as an uninterrupted render. `on_pass` gets the image so far
+        # after every pass.
+        self.start_render(world)
+        return self.run_passes(world, path, on_pass)
+
+    def run_passes(
+        self,
+        world: Hittable,
+        path: str | None = None,
+        on_pass: Callable[[Framebuffer], None] | None = None,
+    ) -> Framebuffer:
+        # The pass loop of `render_passes`, for a render already started
+        buffer = AccumulationBuffer(
+            self.image_width,
+            self.image_height,
+            self.samples_per_pass,
+            path,
+            self.seed,
+            self.sampling,
+        )
+        self.accumulation = buffer
+        total_passes = -(-self.samples_per_pixel // self.samples_per_pass)
+        passes_done, next_row = buffer.progress
+        last_flush = time.monotonic()
+
+        for sample_pass in range(passes_done, total_passes):
+            for j in range(next_row, self.image_height):
+                print(
+                    f"Pass {sample_pass + 1}/{total_passes}, "
+                    f"scanlines remaining: {(self.image_height - 1) - j} ",
+                    end="\r",
+                )
+                self.render_pass_row(world, buffer, sample_pass, j)
+
+                if j + 1 < self.image_height:
+                    buffer.write_header(sample_pass, j + 1)
+                else:
+                    buffer.write_header(sample_pass + 1, 0)
+                if time.monotonic() - last_flush >= self.checkpoint_seconds:
+                    buffer.flush()
+                    last_flush = time.monotonic()
+            next_row = 0
+            if on_pass is not None:
+                buffer.resolve(self.framebuffer)
+                on_pass(self.framebuffer)
+
+        buffer.resolve(self.framebuffer)
+        buffer.flush()
+        return self.framebuffer
+
+    def render_pass_row(
+        self, world: Hittable, buffer: AccumulationBuffer, sample_pass: int, j: int
+    ) -> None:
+        # One pass of `samples_per_pass` samples over scanline `j`
+        rng.seed(pass_seed(self.seed, sample_pass, j))
+        start = time.perf_counter()
+        target = (sample_pass + 1) * self.samples_per_pass
+        sums = []
+        for i in range(self.image_width):
+            px_color = Color(0, 0, 0)
+            self.sampler.start_pixel(i, j, target - self.samples_per_pass)
+            for _ in range(self.samples_per_pass):
+                r = self.get_ray(i, j)
+                px_color += self.sample_color(r, world)
+            sums.append(px_color)
+        buffer.add_row(j, sums, target)
+        if self.stats is not None:
+            self.stats.scanline_seconds.append(time.perf_counter() - start)
+
+    def render_deadline(
+        self, world: Hittable, seconds: float, max_samples: int | None = None
+    ) -> Framebuffer:
+        # Renders the passes of `render_passes` for as long as the next one is
+        # predicted to finish within `seconds` of the call, predicting from
+        # the camera rays per second measured so far. The first pass always
+        # completes. If a later pass runs past the deadline anyway, it stops
+        # at the next scanline, and the finished rows keep their extra
+        # samples: pixels are averaged over their own counts, which are left
+        # in `sample_counts`. `max_samples` caps the samples per pixel, and
+        # must be a whole number of passes.
+        if max_samples is not None and max_samples % self.samples_per_pass:
+            raise ValueError(
+                f"max_samples ({max_samples}) must be a multiple of "
+                f"samples_per_pass ({self.samples_per_pass})"
+            )
+        start = time.perf_counter()
+        deadline = start + seconds
+        self.start_render(world)
+        buffer = AccumulationBuffer(
+            self.image_width,
+            self.image_height,
+            self.samples_per_pass,
+            seed=self.seed,
+            sampling=self.sampling,
+        )
+        self.accumulation = buffer
+        rays_per_row = self.image_width * self.samples_per_pass
+        rays = 0
+        sample_pass = 0
+        cap = max_samples if max_samples is not None else float("inf")
+        while sample_pass * self.samples_per_pass < cap:
+            if sample_pass:
+                now = time.perf_counter()
+                rate = rays / (now - start)
+                if now + self.image_height * rays_per_row / rate > deadline:
+                    break
+            finished = True
+            for j in range(self.image_height):
+                if sample_pass and time.perf_counter() >= deadline:
+                    finished = False
+                    break
+                print(
+                    f"Pass {sample_pass + 1}, {deadline - time.perf_counter():.1f}s "
+                    f"left, scanlines remaining: {(self.image_height - 1) - j} ",
+                    end="\r",
+                )
+                self.render_pass_row(world, buffer, sample_pass, j)
+                rays += rays_per_row
+            if not finished:
+                break
+            sample_pass += 1
+
+        buffer.resolve(self.framebuffer)
+        self.sample_counts = [
+            buffer.count(i, j)
+            for j in range(self.image_height)
+            for i in range(self.image_width)
+        ]
+        return self.framebuffer
+
+    def render_progressive(
+        self, world: Hittable, on_preview: Callable[[Framebuffer], None]
+    ) -> Framebuffer:
+        # A coarse preview that takes one sample per block, then
+        # `render_passes` in memory with a preview after every pass. The
+        # preview samples are thrown away, so the final image is the same as
+        # `render_passes` gives.
+        self.start_render(world)
+        stride = self.preview_stride
+        for j0 in range(0, self.image_height, stride):
+            j1 = min(j0 + stride, self.image_height)
+            for i0 in range(0, self.image_width, stride):
+                i1 = min(i0 + stride, self.image_width)
+                i, j = (i0 + i1) // 2, (j0 + j1) // 2
+                self.sampler.start_pixel(i, j)
+                color = self.sample_color(self.get_ray(i, j), world)
+                for jj in range(j0, j1):
+                    for ii in range(i0, i1):
+                        self.framebuffer.set_pixel(ii, jj, color)
+        on_preview(self.framebuffer)
+        return self.run_passes(world, None, on_preview)
+
+    def tiles(self) -> List[Tuple[int, int, int, int]]:
+        # Tile bounds as (x0, y0, x1, y1), in row-major order
+        size = self.tile_size
+        return [
+            (x, y, min(x + size, self.image_width), min(y + size, self.image_height))
+            for y in range(0, self.image_height, size)
+            for x in range(0, self.image_width, size)
+        ]
+
+    def render_tile(self, world: Hittable, tile_id: int) -> List[Color]:
+        # Each tile gets its own random stream so the result does not depend
+        # on which worker renders it, or when
+        rng.seed(tile_seed(self.seed, tile_id))
+        start = time.perf_counter()
+        x0, y0, x1, y1 = self.tiles()[tile_id]
+        scale = 1.0 / self.samples_per_pixel
+        pixels = []
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                px_color = Color(0, 0, 0)
+                self.sampler.start_pixel(i, j)
+                for _ in range(self.samples_per_pixel):
+                    r = self.get_ray(i, j)
+                    px_color += self.sample_color(r, world)
+                pixels.append(px_color * scale)
+        if self.stats is not None:
+            self.stats.tile_seconds.append(time.perf_counter() - start)
+        return pixels
+
+    def render_parallel(self, world: Hittable) -> Framebuffer:
+        self.start_render(world)
+        tiles = self.tiles()
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self, world),
+        ) as executor:
+            futures = [executor.submit(_render_tile, n) for n in range(len(tiles))]
+            self.gather_tiles(futures)
+        return self.framebuffer
+
+    def gather_tiles(
+        self, futures: List["Future[Tuple[List[Color], RenderStats | None]]"]
+    ) -> None:
+        # Reassemble tiles into the framebuffer in order as they finish,
+        # merging any stats that come back with them
+        tiles = self.tiles()
+        for n, future in enumerate(futures):
+            x0, y0, x1, y1 = tiles[n]
+            result, tile_stats = future.result()
+            if self.stats is not None and tile_stats is not None:
+                self.stats.merge(tile_stats)
+            pixels = iter(result)
+            print(f"Tiles remaining: {len(tiles) - n - 1} ", end="\r")
+            for j in range(y0, y1):
+                for i in range(x0, x1):
+                    self.framebuffer.set_pixel(i, j, next(pixels))
+
+    def render_threaded(self, world: Hittable) -> Framebuffer:
+        # `render_parallel` on `workers` threads that share this world, so
+        # nothing is pickled or copied. Only free-threaded builds render tiles
+        # truly in parallel. Each thread renders with its own copy of the
+        # camera, since the sampler keeps per-pixel state, and draws from its
+        # own `rng` stream, seeded per tile, so the image is the same as
+        # `render_parallel` gives. Stats are kept per thread and merged: the
+        # world counts into a `ThreadStats`, which every thread drains into
+        # its own camera's stats after each tile.
+        self.start_render(world)
+        tiles = self.tiles()
+        local = threading.local()
+        thread_stats: List[RenderStats] = []
+        counters = ThreadStats() if self.stats is not None else None
+        self.attach_stats(world, counters)
+
+        def render(tile_id: int) -> Tuple[List[Color], RenderStats | None]:
+            cam = getattr(local, "cam", None)
+            if cam is None:
+                cam = local.cam = copy.copy(self)
+                cam.sampler = make_sampler(
+                    self.sampling, self.seed, self.samples_per_pixel
+                )
+                if self.stats is not None:
+                    cam.stats = RenderStats()
+                    thread_stats.append(cam.stats)
+            pixels = cam.render_tile(world, tile_id)
+            if counters is not None:
+                counters.drain_into(cam.stats)
+            # This thread's stats are merged once, below
+            return pixels, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(render, n) for n in range(len(tiles))]
+            self.gather_tiles(futures)
+        self.attach_stats(world, self.stats)
+        if self.stats is not None:
+            for stats in thread_stats:
+                self.stats.merge(stats)
+        return self.framebuffer
+
+    def render_wavefront(self, world: Hittable) -> Framebuffer:
+        # Imported here so NumPy is only needed for the wavefront renderer
+        import wavefront
+
+        self.framebuffer = wavefront.render(self, world)
+        return self.framebuffer
 
     def ray_color(self, r: Ray, depth: int, world: Hittable) -> Color:
+        stats = self.stats
         if depth <= 0:
+            if stats is not None:
+                stats.max_depth_terminations += 1
+                stats.record_path(self.max_depth)
+            return Color(0, 0, 0)
+        target = world
+        if depth == self.max_depth and world is self.cull_world:
+            target = self.primary_world
+        found = target.intersect(r, 0.001, math.inf)
+        if found is not None:
+            # Only the closest hit gets a full record
+            rec = HitRecord()
+            found[1].finalize(r, found[0], rec)
+            if self.aov is not None and self.aov.pending:
+                self.aov.record_hit(rec)
+            scattered = Ray()
+            attenuation = Color()
+            if stats is not None:
+                stats.record_hit(type(rec.mat).__name__)
+            # Only the first bounce takes its direction from the sampler
+            sample = self.sampler.get_2d(BOUNCE) if depth == self.max_depth else None
+            if rec.mat.scatter(r, rec, attenuation, scattered, sample):
+                if stats is not None:
+                    stats.secondary_rays += 1
+                color = self.ray_color(scattered, depth - 1, world)
+                color *= attenuation
+                return color
+            if stats is not None:
+                stats.record_absorbed(type(rec.mat).__name__)
+                stats.record_path(self.max_depth - depth + 1)
             return Color(0, 0, 0)
+
+        if stats is not None:
+            stats.record_path(self.max_depth - depth + 1)
+        sky = self.sky_color(r)
+        if self.aov is not None and self.aov.pending:
+            self.aov.record_miss(sky)
+        return sky
+
+    def path_color(self, r: Ray, world: Hittable) -> Color:
+        # Iterative version of `ray_color`: carries the path throughput forward
+        # instead of multiplying attenuation on the way back up the stack, and
+        # ends dim paths early with Russian roulette
+        stats = self.stats
+        throughput = Color(1.0, 1.0, 1.0)
         rec = HitRecord()
+        target = self.primary_world if world is self.cull_world else world
+        for bounce in range(1, self.max_depth + 1):
+            found = target.intersect(r, 0.001, math.inf)
+            if found is None:
+                if stats is not None:
+                    stats.record_path(bounce)
+                color = self.sky_color(r)
+                if self.aov is not None and self.aov.pending:
+                    self.aov.record_miss(color)
+                color *= throughput
+                return color
+            found[1].finalize(r, found[0], rec)
+            if self.aov is not None and self.aov.pending:
+                self.aov.record_hit(rec)
 
-        if world.hit(r, Interval(0.001, float("inf")), rec):
             scattered = Ray()
             attenuation = Color()
-            if rec.mat.scatter(r, rec, attenuation, scattered):
-                return attenuation * self.ray_color(scattered, depth - 1, world)
-            return Color(0, 0, 0)
+            if stats is not None:
+                stats.record_hit(type(rec.mat).__name__)
+            sample = self.sampler.get_2d(BOUNCE) if bounce == 1 else None
+            if not rec.mat.scatter(r, rec, attenuation, scattered, sample):
+                if stats is not None:
+                    stats.record_absorbed(type(rec.mat).__name__)
+                    stats.record_path(bounce)
+                return Color(0, 0, 0)
+            throughput *= attenuation
+
+            if self.rr_min_depth is not None and bounce >= self.rr_min_depth:
+                # Survive with probability p and reweight by 1/p, which keeps
+                # the estimate unbiased
+                p = min(1.0, max(throughput.x, throughput.y, throughput.z))
+                if rng.random() >= p:
+                    if stats is not None:
+                        stats.roulette_terminations += 1
+                        stats.record_path(bounce)
+                    return Color(0, 0, 0)
+                throughput *= 1 / p
+
+            if stats is not None:
+                stats.secondary_rays += 1
+            r = scattered
+            target = world
 
-        unit_direction = unit_vector(r.direction)
-        a = 0.5 * (unit_direction.y + 1.0)
-        return (1.0 - a) * Color(1.0, 1.0, 1.0) + a * Color(0.5, 0.7, 1.0)
+        if stats is not None:
+            stats.max_depth_terminations += 1
+            stats.record_path(self.max_depth)
+        return Color(0, 0, 0)
+
+    def sample_color(self, r: Ray, world: Hittable) -> Color:
+        if self.integrator == "iterative":
+            return self.path_color(r, world)
+        return self.ray_color(r, self.max_depth, world)
+
+    def sky_color(self, r: Ray) -> Color:
+        d = r.direction
+        a = 0.5 * (d.y * (1 / d.length()) + 1.0)
+        # Blend white and sky blue without the intermediate vectors
+        return Color((1.0 - a) + a * 0.5, (1.0 - a) + a * 0.7, (1.0 - a) + a * 1.0)
 
     def defocus_disk_sample(self) -> Point3:
-        p = random_in_unit_disk()
-        return self.center + (p.x * self.defocus_disk_u) + (p.y * self.defocus_disk_v)
+        p = square_to_unit_disk(*self.sampler.get_2d(LENS))
+        origin = self.center.copy()
+        return origin.add_scaled(self.defocus_disk_u, p.x).add_scaled(
+            self.defocus_disk_v, p.y
+        )
+
+
+# Per-process state for `Camera.render_parallel` workers, so the camera and
+# world are pickled once per worker instead of once per tile
+_worker_cam: Camera
+_worker_world: Hittable
+
+
+def _init_worker(cam: Camera, world: Hittable) -> None:
+    global _worker_cam, _worker_world
+    _worker_cam = cam
+    _worker_world = world
+
+
+def _render_tile(tile_id: int) -> Tuple[List[Color], RenderStats | None]:
+    # Fresh stats per tile, merged back into the parent camera's stats
+    if _worker_cam.stats is not None:
+        _worker_cam.stats = RenderStats()
+        _worker_cam.attach_stats(_worker_world, _worker_cam.stats)
+    pixels = _worker_cam.render_tile(_worker_world, tile_id)
+    return pixels, _worker_cam.stats
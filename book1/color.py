@@ -1,7 +1,6 @@
 from vec3 import Vec3
 from typing import TypeAlias
-from interval import Interval
-from typing import Tuple
+from array import array
 import math
 
 Color: TypeAlias = Vec3
@@ -11,15 +10,19 @@ def linear_to_gamma(n: float):
     return math.sqrt(n)
 
 
-def get_color(color: Color, samples_per_pixel) -> Tuple[float, float, float]:
-    intensity = Interval(0.000, 0.999)
-    scale = 1.0 / samples_per_pixel
-    r = linear_to_gamma(color.x * scale)
-    g = linear_to_gamma(color.y * scale)
-    b = linear_to_gamma(color.z * scale)
+def luminance(color: Color) -> float:
+    return 0.2126 * color.x + 0.7152 * color.y + 0.0722 * color.z
 
-    return (
-        int(256 * intensity.clamp(r)),
-        int(256 * intensity.clamp(g)),
-        int(256 * intensity.clamp(b)),
+
+def tonemap(data: array) -> bytes:
+    # Gamma-correct and clamp a whole buffer of linear channel values to
+    # 8 bits in one pass. Clamping to [0, 0.999] in gamma space is the same
+    # as clamping to [0, 0.999^2] before taking the square root.
+    limit = 0.999 * 0.999
+    sqrt = math.sqrt
+    return bytes(
+        [
+            255 if v >= limit else int(256 * sqrt(v)) if v > 0 else 0
+            for v in data
+        ]
     )
@@ -0,0 +1,136 @@
+"""
+Edge-avoiding a-trous wavelet denoiser
+
+Filters a noisy render guided by the first-hit buffers in `aov.AOVBuffers`
+(Dammertz et al. 2010, with the variance-driven colour weight of SVGF). The
+image is divided by the albedo first so only lighting gets blurred, filtered
+with a 5x5 B3-spline kernel whose taps spread out by a factor of two every
+iteration, and multiplied back. Neighbours only count when their normal,
+depth, albedo and lighting are close to the centre pixel's, so edges survive.
+"""
+from __future__ import annotations
+from typing import Tuple
+import numpy as np
+from array import array
+from aov import AOVBuffers
+from framebuffer import Framebuffer
+
+# B3-spline taps; the 5x5 kernel is their outer product
+KERNEL = (1 / 16, 1 / 4, 3 / 8, 1 / 4, 1 / 16)
+
+
+def to_image(fb: Framebuffer) -> np.ndarray:
+    return np.frombuffer(fb.data, dtype=np.float64).reshape(fb.height, fb.width, 3)
+
+
+def from_image(image: np.ndarray) -> Framebuffer:
+    height, width, _ = image.shape
+    fb = Framebuffer(width, height)
+    fb.data = array("d", np.ascontiguousarray(image, dtype=np.float64).tobytes())
+    return fb
+
+
+def luminance(image: np.ndarray) -> np.ndarray:
+    return image @ np.array((0.2126, 0.7152, 0.0722))
+
+
+def shifted(padded: np.ndarray, pad: int, dy: int, dx: int, shape: Tuple[int, int]):
+    h, w = shape
+    return padded[pad + dy : pad + dy + h, pad + dx : pad + dx + w]
+
+
+def blur3x3(a: np.ndarray) -> np.ndarray:
+    # Small Gaussian, used to steady the per-pixel variance estimate
+    p = np.pad(a, 1, mode="edge")
+    h, w = a.shape
+    taps = (0.25, 0.5, 0.25)
+    out = np.zeros_like(a)
+    for dy, wy in enumerate(taps):
+        for dx, wx in enumerate(taps):
+            out += wy * wx * p[dy : dy + h, dx : dx + w]
+    return out
+
+
+def denoise(
+    color: Framebuffer,
+    aov: AOVBuffers,
+    iterations: int = 2,
+    sigma_color: float = 2.0,
+    sigma_normal: float = 8.0,
+    sigma_depth: float = 0.1,
+    sigma_albedo: float = 0.3,
+) -> Framebuffer:
+    image = to_image(color)
+    normal = to_image(aov.normal)
+    albedo = to_image(aov.albedo)
+    depth = to_image(aov.depth)[:, :, 0]
+    variance = to_image(aov.variance)[:, :, 0]
+    shape = depth.shape
+
+    # Filter lighting rather than colour, so texture detail is not smeared
+    safe_albedo = np.maximum(albedo, 1e-3)
+    light = image / safe_albedo
+    variance = variance / np.maximum(luminance(safe_albedo), 1e-3) ** 2
+    # Averaged normals are shorter than one; renormalise so the centre tap
+    # always has full weight
+    length = np.linalg.norm(normal, axis=2, keepdims=True)
+    has_normal = length[:, :, 0] > 1e-6
+    normal = np.where(has_normal[:, :, None], normal / np.maximum(length, 1e-6), 0.0)
+
+    pad = 2 << max(0, iterations - 1)
+
+    def edge_pad(a: np.ndarray) -> np.ndarray:
+        widths = ((pad, pad), (pad, pad)) + ((0, 0),) * (a.ndim - 2)
+        return np.pad(a, widths, mode="edge")
+
+    p_normal = edge_pad(normal)
+    p_albedo = edge_pad(albedo)
+    p_depth = edge_pad(depth)
+    p_has_normal = edge_pad(has_normal)
+
+    for it in range(iterations):
+        step = 1 << it
+        lum = luminance(light)
+        p_light = edge_pad(light)
+        p_lum = edge_pad(lum)
+        p_variance = edge_pad(variance)
+        color_scale = sigma_color * np.sqrt(np.maximum(blur3x3(variance), 0)) + 1e-6
+        depth_scale = sigma_depth * step * np.maximum(depth, 1e-3)
+
+        total = np.zeros_like(light)
+        weights = np.zeros(shape)
+        total_variance = np.zeros(shape)
+        for ky, hy in enumerate(KERNEL):
+            for kx, hx in enumerate(KERNEL):
+                dy, dx = (ky - 2) * step, (kx - 2) * step
+                q_normal = shifted(p_normal, pad, dy, dx, shape)
+                q_has_normal = shifted(p_has_normal, pad, dy, dx, shape)
+                cosine = np.maximum(0.0, np.einsum("ijk,ijk->ij", normal, q_normal))
+                # Sky pixels have no normal and only blend with other sky
+                w_normal = np.where(
+                    has_normal & q_has_normal,
+                    cosine**sigma_normal,
+                    (has_normal == q_has_normal).astype(np.float64),
+                )
+                w_depth = np.exp(
+                    -np.abs(depth - shifted(p_depth, pad, dy, dx, shape)) / depth_scale
+                )
+                albedo_diff = albedo - shifted(p_albedo, pad, dy, dx, shape)
+                w_albedo = np.exp(
+                    -np.einsum("ijk,ijk->ij", albedo_diff, albedo_diff)
+                    / (sigma_albedo * sigma_albedo)
+                )
+                w_color = np.exp(
+                    -np.abs(lum - shifted(p_lum, pad, dy, dx, shape)) / color_scale
+                )
+                w = (hx * hy) * w_normal * w_depth * w_albedo * w_color
+
+                total += w[:, :, None] * shifted(p_light, pad, dy, dx, shape)
+                weights += w
+                total_variance += w * w * shifted(p_variance, pad, dy, dx, shape)
+
+        # The centre tap always has a weight of at least hx * hy
+        light = total / weights[:, :, None]
+        variance = total_variance / (weights * weights)
+
+    return from_image(light * safe_albedo)
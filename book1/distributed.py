@@ -0,0 +1,208 @@
+"""
+Distributed tile rendering over TCP
+
+A coordinator pickles the camera and world once, hands tiles to any number of
+workers and merges their results into a framebuffer. Tiles held by a worker
+that disconnects or times out go back on the queue for another worker. Tiles
+are seeded by `Camera.render_tile`, so the image is the same as
+`Camera.render_parallel` however the tiles are spread out.
+
+Messages are pickles, so only run this between hosts you trust.
+
+Worker usage: python distributed.py HOST:PORT
+"""
+from array import array
+from camera import Camera
+from color import Color
+from framebuffer import Framebuffer
+from hittable import Hittable
+from stats import RenderStats
+from typing import Any, Dict, List, Tuple
+import multiprocessing
+import pickle
+import queue
+import socket
+import struct
+import sys
+import threading
+
+FRAME = struct.Struct(">Q")
+
+
+def send_frame(conn: socket.socket, payload: bytes) -> None:
+    conn.sendall(FRAME.pack(len(payload)) + payload)
+
+
+def recv_exact(conn: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = conn.recv(min(n, 1 << 20))
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(conn: socket.socket, message: Any) -> None:
+    send_frame(conn, pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+
+def recv_message(conn: socket.socket) -> Any:
+    (size,) = FRAME.unpack(recv_exact(conn, FRAME.size))
+    return pickle.loads(recv_exact(conn, size))
+
+
+class Coordinator:
+    cam: Camera
+    tiles: List[Tuple[int, int, int, int]]
+    address: Tuple[str, int]
+    tile_timeout: float
+
+    def __init__(
+        self,
+        cam: Camera,
+        world: Hittable,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tile_timeout: float = 600,
+    ) -> None:
+        self.cam = cam
+        self.tiles = cam.tiles()
+        self.tile_timeout = tile_timeout
+        # Serialise the scene once and send the same bytes to every worker
+        self.job = pickle.dumps(("job", cam, world), pickle.HIGHEST_PROTOCOL)
+        self.pending: queue.Queue[int] = queue.Queue()
+        for n in range(len(self.tiles)):
+            self.pending.put(n)
+        self.results: Dict[int, bytes] = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.handlers: List[threading.Thread] = []
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()[:2]
+
+    def serve(self) -> Framebuffer:
+        # Blocks until every tile has come back
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        while not self.done.wait(0.5):
+            remaining = len(self.tiles) - len(self.results)
+            print(f"Tiles remaining: {remaining} ", end="\r")
+        self.server.close()
+        # Give idle workers the chance to hear they can stop
+        for handler in self.handlers:
+            handler.join(timeout=1)
+
+        fb = Framebuffer(self.cam.image_width, self.cam.image_height)
+        for n, (x0, y0, x1, y1) in enumerate(self.tiles):
+            pixels = array("d", self.results[n])
+            k = 0
+            for j in range(y0, y1):
+                for i in range(x0, x1):
+                    fb.set_pixel(i, j, Color(pixels[k], pixels[k + 1], pixels[k + 2]))
+                    k += 3
+        return fb
+
+    def accept_loop(self) -> None:
+        while not self.done.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            handler = threading.Thread(target=self.handle, args=(conn,), daemon=True)
+            handler.start()
+            self.handlers.append(handler)
+
+    def handle(self, conn: socket.socket) -> None:
+        tile = None
+        try:
+            with conn:
+                conn.settimeout(self.tile_timeout)
+                send_frame(conn, self.job)
+                while True:
+                    try:
+                        tile = self.pending.get(timeout=0.5)
+                    except queue.Empty:
+                        if self.done.is_set():
+                            send_message(conn, ("done",))
+                            return
+                        continue
+                    send_message(conn, ("tile", tile))
+                    _, tile_id, data, stats = recv_message(conn)
+                    self.finish(tile_id, data, stats)
+                    tile = None
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            # Dead or misbehaving worker: let someone else have its tile
+            if tile is not None:
+                self.pending.put(tile)
+
+    def finish(self, tile_id: int, data: bytes, stats: RenderStats | None) -> None:
+        with self.lock:
+            if tile_id in self.results:
+                # A retried tile that came back twice; count it once
+                return
+            self.results[tile_id] = data
+            if stats is not None and self.cam.stats is not None:
+                self.cam.stats.merge(stats)
+            if len(self.results) == len(self.tiles):
+                self.done.set()
+
+
+def run_worker(host: str, port: int) -> None:
+    with socket.create_connection((host, port)) as conn:
+        _, cam, world = recv_message(conn)
+        while True:
+            try:
+                message = recv_message(conn)
+            except EOFError:
+                # The coordinator went away, most likely because it finished
+                return
+            if message[0] == "done":
+                return
+            _, tile_id = message
+            if cam.stats is not None:
+                # Fresh stats per tile, merged by the coordinator
+                cam.stats = RenderStats()
+                cam.attach_stats(world, cam.stats)
+            pixels = cam.render_tile(world, tile_id)
+            data = array("d", [c for p in pixels for c in (p.x, p.y, p.z)])
+            send_message(conn, ("result", tile_id, data.tobytes(), cam.stats))
+
+
+def render_distributed(
+    cam: Camera,
+    world: Hittable,
+    local_workers: int = 0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Framebuffer:
+    # Serve tiles on host:port, optionally starting some workers on this
+    # machine; remote workers can join at any time
+    coordinator = Coordinator(cam, world, host, port)
+    print(f"Coordinator listening on {coordinator.address[0]}:{coordinator.address[1]}")
+    connect_host = "127.0.0.1" if host in ("", "0.0.0.0") else host
+    processes = [
+        multiprocessing.Process(
+            target=run_worker, args=(connect_host, coordinator.address[1]), daemon=True
+        )
+        for _ in range(local_workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        return coordinator.serve()
+    finally:
+        for p in processes:
+            p.join(timeout=5)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python distributed.py HOST:PORT")
+        raise SystemExit(1)
+    run_worker(*parse_address(sys.argv[1]))
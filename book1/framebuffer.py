@@ -0,0 +1,90 @@
+from array import array
+from color import Color, tonemap
+import os
+import struct
+import sys
+import zlib
+
+
+class Framebuffer:
+    # Linear RGB render target, stored as row-major float channels
+    width: int
+    height: int
+    data: array
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.data = array("d", bytes(8 * 3 * width * height))
+
+    def set_pixel(self, i: int, j: int, color: Color) -> None:
+        k = 3 * (j * self.width + i)
+        self.data[k] = color.x
+        self.data[k + 1] = color.y
+        self.data[k + 2] = color.z
+
+    def get_pixel(self, i: int, j: int) -> Color:
+        k = 3 * (j * self.width + i)
+        return Color(self.data[k], self.data[k + 1], self.data[k + 2])
+
+    def to_bytes(self) -> bytes:
+        return tonemap(self.data)
+
+    def write(self, path: str) -> None:
+        # Pick the writer from the file extension
+        if path.endswith(".png"):
+            self.write_png(path)
+        elif path.endswith(".pfm"):
+            self.write_pfm(path)
+        else:
+            self.write_ppm(path)
+
+    def write_atomic(self, path: str) -> None:
+        # Write to a temporary file beside `path` and rename it into place,
+        # so a viewer never sees a half-written image
+        root, ext = os.path.splitext(path)
+        tmp = f"{root}.{os.getpid()}.tmp{ext}"
+        self.write(tmp)
+        os.replace(tmp, path)
+
+    def write_ppm(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(f"P6\n{self.width} {self.height}\n255\n".encode())
+            f.write(self.to_bytes())
+
+    def write_png(self, path: str) -> None:
+        pixels = self.to_bytes()
+        stride = 3 * self.width
+        # Every scanline starts with filter type 0 (none)
+        raw = b"".join(
+            b"\x00" + pixels[y * stride : (y + 1) * stride] for y in range(self.height)
+        )
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(
+                png_chunk(
+                    b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+                )
+            )
+            f.write(png_chunk(b"IDAT", zlib.compress(raw, 6)))
+            f.write(png_chunk(b"IEND", b""))
+
+    def write_pfm(self, path: str) -> None:
+        # Portable float map: little-endian float32, rows stored bottom-up
+        floats = array("f", self.data)
+        if sys.byteorder == "big":
+            floats.byteswap()
+        stride = 3 * self.width
+        with open(path, "wb") as f:
+            f.write(f"PF\n{self.width} {self.height}\n-1.0\n".encode())
+            for y in reversed(range(self.height)):
+                f.write(floats[y * stride : (y + 1) * stride].tobytes())
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
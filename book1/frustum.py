@@ -0,0 +1,120 @@
+"""
+Per-tile frustum culling of primary rays
+
+Every camera ray of a tile starts on the lens disk and passes through the
+tile's patch of the focus plane, so it stays inside a frustum built from those
+two. `tile_worlds` keeps, for each tile, only the objects whose bounding
+sphere overlaps the tile's frustum, and of a `SphereSet` only the spheres
+that do; primary rays intersect that short list and find the same closest
+hit as they would against the whole world.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Tuple
+from bvh import BVHNode
+from hittable import Hittable, HittableList
+from sphere import Sphere
+from vec3 import Point3, Vec3, dot
+
+if TYPE_CHECKING:
+    from camera import Camera
+
+# A plane as (normal, offset), normal unit length, with the inside where
+# dot(normal, p) + offset >= 0
+Plane = Tuple[Vec3, float]
+
+# Slack on the overlap test, so a ray grazing a frustum side in floating
+# point still finds its object
+EPSILON = 1e-6
+
+
+def primitives(world: Hittable) -> List[Hittable]:
+    # The leaves under lists and BVH nodes, in traversal order
+    if isinstance(world, HittableList):
+        return [p for obj in world.objects for p in primitives(obj)]
+    if isinstance(world, BVHNode):
+        if world.right is world.left:
+            return primitives(world.left)
+        return primitives(world.left) + primitives(world.right)
+    return [world]
+
+
+def bounding_sphere(obj: Hittable) -> Tuple[Point3, float]:
+    if isinstance(obj, Sphere):
+        # Hollow glass uses a negative radius
+        return obj.center, abs(obj.radius)
+    box = obj.bounding_box()
+    lo = Point3(box.x.min_value, box.y.min_value, box.z.min_value)
+    hi = Point3(box.x.max_value, box.y.max_value, box.z.max_value)
+    return 0.5 * (lo + hi), 0.5 * (hi - lo).length()
+
+
+def tile_planes(cam: Camera, x0: int, y0: int, x1: int, y1: int) -> List[Plane]:
+    # In camera space a ray from lens point o through focus-plane point p is
+    # at o + (p - o) * s / F at depth s. Across the lens (radius rho) and the
+    # tile's slopes [lo, hi] along u, x(s) >= lo * s - rho * |1 - s / F|,
+    # which the plane x = -rho + (lo - rho / F) * s stays under for every
+    # s >= 0; likewise for the other three sides. The near plane s = 0 drops
+    # objects behind the lens.
+    center = cam.center
+    rho = 0.0
+    if cam.defocus_angle > 0:
+        rho = max(cam.defocus_disk_u.length(), cam.defocus_disk_v.length())
+
+    # Pixel samples are jittered up to half a pixel either side of centres
+    su: List[float] = []
+    sv: List[float] = []
+    depth = 0.0
+    for x in (x0 - 0.5, x1 - 0.5):
+        for y in (y0 - 0.5, y1 - 0.5):
+            p = cam.px00_loc.copy()
+            p.add_scaled(cam.px_delta_u, x).add_scaled(cam.px_delta_v, y)
+            p -= center
+            s = -dot(p, cam.w)
+            su.append(dot(p, cam.u) / s)
+            sv.append(dot(p, cam.v) / s)
+            depth += s / 4
+    spread = rho / depth
+
+    planes: List[Plane] = [(-cam.w, dot(cam.w, center))]
+    for axis, slopes in ((cam.u, su), (cam.v, sv)):
+        lo, hi = min(slopes) - spread, max(slopes) + spread
+        for sign, slope in ((1.0, lo), (-1.0, hi)):
+            # sign * (x - slope * s) + rho >= 0, with x and s relative to the
+            # camera centre
+            normal = sign * (axis + slope * cam.w)
+            scale = 1 / normal.length()
+            normal = scale * normal
+            planes.append((normal, (rho * scale) - dot(normal, center)))
+    return planes
+
+
+def overlaps(planes: List[Plane], center: Point3, radius: float) -> bool:
+    return all(dot(n, center) + d >= -(radius + EPSILON) for n, d in planes)
+
+
+def tile_worlds(cam: Camera, world: Hittable) -> List[Hittable]:
+    # One candidate world per tile of `cam.tiles()`, a BVH if `world` is one.
+    # `cam` must be set up.
+    objects = [(obj, *bounding_sphere(obj)) for obj in primitives(world)]
+    worlds: List[Hittable] = []
+    for x0, y0, x1, y1 in cam.tiles():
+        planes = tile_planes(cam, x0, y0, x1, y1)
+        candidates = []
+        for obj, c, r in objects:
+            if not overlaps(planes, c, r):
+                continue
+            if hasattr(obj, "select"):
+                # `SphereSet`, culled sphere by sphere without importing
+                # NumPy here
+                obj = obj.select(planes, EPSILON)
+                if obj is None:
+                    continue
+            candidates.append(obj)
+        if isinstance(world, BVHNode) and candidates:
+            worlds.append(BVHNode(candidates))
+            continue
+        tile = HittableList()
+        for obj in candidates:
+            tile.add(obj)
+        worlds.append(tile)
+    return worlds
@@ -2,13 +2,13 @@ from vec3 import Vec3, Point3, dot
 from abc import ABC, abstractmethod
 from ray import Ray
 from interval import Interval
-from typing import List, Any, TYPE_CHECKING
-
-from typing import TYPE_CHECKING
+from aabb import AABB, empty_box
+from typing import List, Any, Tuple, TYPE_CHECKING
 
 # Hack to avoid circular import
 if TYPE_CHECKING:
     from material import Material
+    from stats import RenderStats
 
 
 class HitRecord:
@@ -32,38 +32,73 @@ class HitRecord:
 
 
 class Hittable(ABC):
-    @abstractmethod
+    # Intersection comes in two steps: `intersect` finds the distance to the
+    # closest hit and the primitive hit, and only then `finalize` works out
+    # the point, normal and material, once per ray instead of once for every
+    # candidate that a closer hit later replaces
     def hit(self, r: Ray, ray_t: Interval, rec: HitRecord) -> bool:
+        found = self.intersect(r, ray_t.min_value, ray_t.max_value)
+        if found is None:
+            return False
+        t, primitive = found
+        primitive.finalize(r, t, rec)
+        return True
+
+    @abstractmethod
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> "Tuple[float, Hittable] | None":
+        # (t, primitive) for the closest hit with t_min < t < t_max
+        pass
+
+    def finalize(self, r: Ray, t: float, rec: HitRecord) -> None:
+        # Fills `rec` for a hit at `t` reported by `intersect`; only the
+        # primitives that `intersect` returns need this
+        raise NotImplementedError(f"{type(self).__name__} is not a primitive")
+
+    @abstractmethod
+    def bounding_box(self) -> AABB:
         pass
 
 
 class HittableList(Hittable):
     objects: List[Hittable]
-    temp_rec: HitRecord
+    bbox: AABB
+    stats: "RenderStats | None" = None
 
     def __init__(self) -> None:
         self.objects = []
-        self.temp_rec = HitRecord()
-
-    def hit(self, r: Ray, ray_t: Interval, rec: HitRecord) -> bool:
-        temp_rec = HitRecord()
-        hit_anything = False
-        closest_so_far = ray_t.max_value
-
+        self.bbox = empty_box
+
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        if self.stats is not None:
+            self.stats.intersection_tests += len(self.objects)
+        closest = None
         for object in self.objects:
-            if object.hit(r, Interval(ray_t.min_value, closest_so_far), temp_rec):
-                hit_anything = True
-                closest_so_far = temp_rec.t
-                rec.t = temp_rec.t
-                rec.p = temp_rec.p
-                rec.normal = temp_rec.normal
-                rec.front_face = temp_rec.front_face
-                rec.mat = temp_rec.mat
+            found = object.intersect(r, t_min, t_max)
+            if found is not None:
+                closest = found
+                t_max = found[0]
+        return closest
 
-        return hit_anything
+    def bounding_box(self) -> AABB:
+        return self.bbox
 
     def add(self, h: Hittable):
         self.objects.append(h)
+        self.bbox = AABB.surrounding(self.bbox, h.bounding_box())
+
+    def extend(self, objects: List[Hittable], bbox: AABB | None = None):
+        # Bulk add; pass `bbox` when the caller already knows the bounds
+        self.objects.extend(objects)
+        if bbox is None:
+            for h in objects:
+                self.bbox = AABB.surrounding(self.bbox, h.bounding_box())
+        else:
+            self.bbox = AABB.surrounding(self.bbox, bbox)
 
     def clear(self):
         self.objects = []
+        self.bbox = empty_box
@@ -0,0 +1,373 @@
+"""
+Incremental re-rendering after scene edits
+
+`IncrementalRenderer` renders tile by tile (seeded like `Camera.render_tile`)
+and records what each tile's paths depended on, as two bitsets:
+
+- objects: the top-level objects any of the tile's rays hit. Removing or
+  recolouring one of these changes the tile.
+- cells: the cells of a coarse grid that any ray segment passed through,
+  up to its hit point. A new or moved object can only change a tile if one
+  of its segments now hits it, i.e. only if the object's box overlaps a cell
+  the tile already passes through. One extra bit stands for everywhere
+  outside the grid.
+
+The next `render` diffs the object list against the last one by content, so
+objects may be edited in place, replaced or reordered, re-renders the tiles
+that could have changed and keeps the rest. The image matches a full render
+of the edited scene. Camera or sky changes re-render everything.
+"""
+from aabb import AABB, empty_box
+from camera import Camera
+from framebuffer import Framebuffer
+from hittable import Hittable, HittableList
+from interval import Interval
+from ray import Ray
+from scene import camera_to_dict, material_to_dict
+from sphere import Sphere
+from typing import Dict, List, Set, Tuple
+import math
+import pickle
+
+# Target number of grid cells; cells are close to cubes
+GRID_CELLS = 32768
+# Objects more than this many times larger than the median object are left
+# out of the grid bounds, so a ground sphere does not stretch the grid
+GRID_OUTLIER = 10.0
+
+
+def fingerprint(obj: Hittable) -> Tuple[bytes, bytes]:
+    # (geometry, material) keys; equal keys render the same
+    if isinstance(obj, Sphere):
+        c = obj.center
+        geometry = pickle.dumps(("sphere", c.x, c.y, c.z, obj.radius))
+        return geometry, pickle.dumps(material_to_dict(obj.mat))
+    obj.bounding_box()  # So lazily built boxes do not change the pickle
+    return pickle.dumps(obj), b""
+
+
+def object_box(obj: Hittable) -> AABB:
+    if isinstance(obj, Sphere):
+        # The cached box goes stale when a sphere is moved in place
+        obj.bbox = None
+    return obj.bounding_box()
+
+
+class Grid:
+    # Uniform grid over `bounds`; cell k is bit k, bit `outside` is the rest
+    # of space
+    lo: Tuple[float, float, float]
+    size: Tuple[float, float, float]
+    n: Tuple[int, int, int]
+    outside: int
+
+    def __init__(self, bounds: AABB, cells: int = GRID_CELLS) -> None:
+        axes = (bounds.x, bounds.y, bounds.z)
+        extent = [max(a.size(), 1e-9) for a in axes]
+        side = (extent[0] * extent[1] * extent[2] / cells) ** (1 / 3)
+        self.n = tuple(max(1, min(cells, round(e / side))) for e in extent)
+        self.lo = tuple(a.min_value for a in axes)
+        self.size = tuple(e / n for e, n in zip(extent, self.n))
+        self.outside = self.n[0] * self.n[1] * self.n[2]
+
+    @classmethod
+    def around(cls, objects: List[Hittable]) -> "Grid":
+        if not objects:
+            return cls(AABB(Interval(0, 1), Interval(0, 1), Interval(0, 1)))
+        boxes = [object_box(obj) for obj in objects]
+        sides = [max(b.x.size(), b.y.size(), b.z.size()) for b in boxes]
+        limit = GRID_OUTLIER * sorted(sides)[len(sides) // 2]
+        bounds = empty_box
+        for box, side in zip(boxes, sides):
+            if side <= limit:
+                bounds = AABB.surrounding(bounds, box)
+        # Pad, so objects resting on the bounds are not partly outside
+        pad = 0.01 * max(bounds.x.size(), bounds.y.size(), bounds.z.size())
+        return cls(
+            AABB(
+                Interval(bounds.x.min_value - pad, bounds.x.max_value + pad),
+                Interval(bounds.y.min_value - pad, bounds.y.max_value + pad),
+                Interval(bounds.z.min_value - pad, bounds.z.max_value + pad),
+            )
+        )
+
+    def mark_segment(self, cells: bytearray, r: Ray, t0: float, t1: float) -> None:
+        # 3D DDA (Amanatides & Woo) over the part of the segment inside the grid
+        o = (r.origin.x, r.origin.y, r.origin.z)
+        d = (r.direction.x, r.direction.y, r.direction.z)
+        t_in, t_out = t0, t1
+        for a in range(3):
+            lo = self.lo[a]
+            hi = lo + self.n[a] * self.size[a]
+            if d[a] == 0:
+                if o[a] < lo or o[a] > hi:
+                    t_out = -1.0
+                    break
+                continue
+            ta = (lo - o[a]) / d[a]
+            tb = (hi - o[a]) / d[a]
+            if ta > tb:
+                ta, tb = tb, ta
+            t_in = max(t_in, ta)
+            t_out = min(t_out, tb)
+        if t_in > t0 or t_out < t1:
+            k = self.outside
+            cells[k >> 3] |= 1 << (k & 7)
+        if t_in > t_out:
+            return
+
+        # Per axis: cell index, step, t of the next boundary and t per cell
+        walk = []
+        for a in range(3):
+            lo, size, n = self.lo[a], self.size[a], self.n[a]
+            i = min(n - 1, max(0, math.floor((o[a] + d[a] * t_in - lo) / size)))
+            if d[a] > 0:
+                boundary = lo + (i + 1) * size
+                walk.append((i, 1, (boundary - o[a]) / d[a], size / d[a], n))
+            elif d[a] < 0:
+                boundary = lo + i * size
+                walk.append((i, -1, (boundary - o[a]) / d[a], -size / d[a], n))
+            else:
+                walk.append((i, 0, math.inf, math.inf, n))
+        (ix, sx, tx, dx, nx), (iy, sy, ty, dy, ny), (iz, sz, tz, dz, nz) = walk
+
+        # Unrolled over the axes; this runs for every cell of every segment
+        while True:
+            k = ix + nx * (iy + ny * iz)
+            cells[k >> 3] |= 1 << (k & 7)
+            if tx <= ty and tx <= tz:
+                if tx > t_out:
+                    return
+                ix += sx
+                if not 0 <= ix < nx:
+                    return
+                tx += dx
+            elif ty <= tz:
+                if ty > t_out:
+                    return
+                iy += sy
+                if not 0 <= iy < ny:
+                    return
+                ty += dy
+            else:
+                if tz > t_out:
+                    return
+                iz += sz
+                if not 0 <= iz < nz:
+                    return
+                tz += dz
+
+    def box_bits(self, box: AABB) -> int:
+        # Every cell the box touches, widened a little so segments passing
+        # right along a cell boundary are still caught
+        bits = 0
+        ranges = []
+        for a, interval in enumerate((box.x, box.y, box.z)):
+            margin = 1e-6 * self.size[a]
+            lo = (interval.min_value - margin - self.lo[a]) / self.size[a]
+            hi = (interval.max_value + margin - self.lo[a]) / self.size[a]
+            if lo < 0 or hi >= self.n[a]:
+                bits |= 1 << self.outside
+            lo = max(0, math.floor(lo))
+            hi = min(self.n[a] - 1, math.floor(hi))
+            if lo > hi:
+                return bits
+            ranges.append(range(lo, hi + 1))
+        nx, ny, _ = self.n
+        for iz in ranges[2]:
+            for iy in ranges[1]:
+                row = nx * (iy + ny * iz)
+                width = len(ranges[0])
+                bits |= ((1 << width) - 1) << (row + ranges[0].start)
+        return bits
+
+
+class Recorder(Hittable):
+    # Wraps the world and records each segment traced through it
+    world: Hittable
+    grid: Grid
+    objects: Set[int]
+    cells: bytearray
+    # Id of the last tracked object hit; set by `Tracked`
+    hit_id: int
+
+    def __init__(self, world: Hittable, grid: Grid) -> None:
+        self.world = world
+        self.grid = grid
+        self.start_tile()
+
+    def start_tile(self) -> None:
+        self.objects = set()
+        self.cells = bytearray(self.grid.outside // 8 + 1)
+
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        found = self.world.intersect(r, t_min, t_max)
+        if found is not None:
+            # The closest-hit search narrows the interval as it goes, so the
+            # last tracked object to report a hit is the closest one
+            self.objects.add(self.hit_id)
+        end = t_max if found is None else found[0]
+        self.grid.mark_segment(self.cells, r, t_min, end)
+        return found
+
+    def bounding_box(self) -> AABB:
+        return self.world.bounding_box()
+
+
+class Tracked(Hittable):
+    obj: Hittable
+    id: int
+    recorder: Recorder
+
+    def __init__(self, obj: Hittable, id: int, recorder: Recorder) -> None:
+        self.obj = obj
+        self.id = id
+        self.recorder = recorder
+
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        found = self.obj.intersect(r, t_min, t_max)
+        if found is not None:
+            self.recorder.hit_id = self.id
+        return found
+
+    def bounding_box(self) -> AABB:
+        return self.obj.bounding_box()
+
+
+def camera_key(cam: Camera) -> bytes:
+    # Everything on the camera side that decides the pixels, the sky included
+    sky = cam.sky_color.__func__
+    return pickle.dumps(
+        (
+            camera_to_dict(cam),
+            cam.seed,
+            cam.tile_size,
+            cam.sampling,
+            cam.integrator,
+            cam.rr_min_depth,
+            sky.__module__,
+            sky.__qualname__,
+            sky.__code__.co_code,
+            sky.__code__.co_consts,
+        )
+    )
+
+
+class IncrementalRenderer:
+    cam: Camera
+    # Build a BVH over the objects for every render
+    bvh: bool
+    # Tiles re-rendered by the last `render` call
+    dirty: List[int]
+
+    def __init__(self, cam: Camera, bvh: bool = False) -> None:
+        self.cam = cam
+        self.bvh = bvh
+        self.dirty = []
+        self.camera_key: bytes | None = None
+        self.grid: Grid | None = None
+        self.next_id = 0
+        # Per object of the last render: fingerprint, id and box
+        self.keys: List[Tuple[bytes, bytes]] = []
+        self.ids: List[int] = []
+        self.boxes: List[AABB] = []
+        # Per tile: pixels, object ids bitset and cells bitset
+        self.pixels: List[List] = []
+        self.object_bits: List[int] = []
+        self.cell_bits: List[int] = []
+
+    def render(self, world: HittableList) -> Framebuffer:
+        cam = self.cam
+        cam.setup()
+        objects = list(world.objects)
+        keys = [fingerprint(obj) for obj in objects]
+        tiles = cam.tiles()
+
+        key = camera_key(cam)
+        if key != self.camera_key or self.grid is None:
+            self.camera_key = key
+            self.grid = Grid.around(objects)
+            ids = list(range(self.next_id, self.next_id + len(objects)))
+            self.next_id += len(objects)
+            dirty = list(range(len(tiles)))
+            self.pixels = [[] for _ in tiles]
+            self.object_bits = [0] * len(tiles)
+            self.cell_bits = [0] * len(tiles)
+        else:
+            ids, changed_objects, changed_cells = self.diff(objects, keys)
+            dirty = [
+                n
+                for n in range(len(tiles))
+                if self.object_bits[n] & changed_objects
+                or self.cell_bits[n] & changed_cells
+            ]
+
+        recorder = Recorder(HittableList(), self.grid)
+        tracked: List[Hittable] = [
+            Tracked(obj, id, recorder) for obj, id in zip(objects, ids)
+        ]
+        if self.bvh and tracked:
+            from bvh import BVHNode
+
+            recorder.world = BVHNode(tracked)
+        else:
+            recorder.world.extend(tracked)
+
+        for done, n in enumerate(dirty, 1):
+            recorder.start_tile()
+            self.pixels[n] = cam.render_tile(recorder, n)
+            self.object_bits[n] = sum(1 << id for id in recorder.objects)
+            self.cell_bits[n] = int.from_bytes(recorder.cells, "little")
+            print(f"Tiles remaining: {len(dirty) - done} ", end="\r")
+
+        self.keys = keys
+        self.ids = ids
+        self.boxes = [object_box(obj) for obj in objects]
+        self.dirty = dirty
+
+        fb = Framebuffer(cam.image_width, cam.image_height)
+        for (x0, y0, x1, y1), tile_pixels in zip(tiles, self.pixels):
+            pixels = iter(tile_pixels)
+            for j in range(y0, y1):
+                for i in range(x0, x1):
+                    fb.set_pixel(i, j, next(pixels))
+        cam.framebuffer = fb
+        return fb
+
+    def diff(
+        self, objects: List[Hittable], keys: List[Tuple[bytes, bytes]]
+    ) -> Tuple[List[int], int, int]:
+        # Matches the new objects against the last render's. Returns the ids
+        # for the new objects, the ids whose hits are no longer valid and the
+        # cells new geometry has moved into.
+        old: Dict[Tuple[bytes, bytes], List[int]] = {}
+        for n, key in enumerate(self.keys):
+            old.setdefault(key, []).append(n)
+
+        ids: List[int | None] = [None] * len(objects)
+        added = []
+        for n, key in enumerate(keys):
+            if old.get(key):
+                ids[n] = self.ids[old[key].pop()]
+            else:
+                added.append(n)
+        removed = [n for matches in old.values() for n in matches]
+
+        # Geometry that was already there (say, a recoloured sphere) cannot
+        # be hit by any segment that missed it before
+        old_geometry = {self.keys[n][0] for n in removed}
+
+        changed_objects = 0
+        for n in removed:
+            changed_objects |= 1 << self.ids[n]
+        changed_cells = 0
+        for n in added:
+            ids[n] = self.next_id
+            self.next_id += 1
+            if keys[n][0] not in old_geometry:
+                changed_cells |= self.grid.box_bits(object_box(objects[n]))
+        return ids, changed_objects, changed_cells
@@ -8,6 +8,13 @@ class Interval:
         self.min_value = min_value
         self.max_value = max_value
 
+    @classmethod
+    def surrounding(cls, a: "Interval", b: "Interval") -> "Interval":
+        return cls(min(a.min_value, b.min_value), max(a.max_value, b.max_value))
+
+    def size(self) -> float:
+        return self.max_value - self.min_value
+
     def contains(self, x: float) -> bool:
         return self.min_value <= x and x <= self.max_value
 
@@ -1,19 +1,30 @@
 """
 Ray Tracing in one weekend - Book 1 code
 """
+import argparse
+import cProfile
+import pstats
 import sys
 import math
 from ray import Ray
 from sphere import Sphere
 from vec3 import Vec3, Point3, dot, cross, unit_vector
-from color import Color, get_color
+from color import Color
 from hittable import HittableList, Hittable, HitRecord
 from interval import Interval
 from material import Lambertian, Metal, Dielectric
 from camera import Camera
+from bvh import BVHNode
+from stats import RenderStats
+from aov import AOVBuffers
+from distributed import render_distributed, parse_address
+from scene import load_scene, save_scene
 import utils
 import sys
-import random
+import time
+import rng
+from framebuffer import Framebuffer
+from typing import Callable
 
 
 def ray_color(r: Ray, world: HittableList) -> Color:
@@ -27,15 +38,169 @@ def ray_color(r: Ray, world: HittableList) -> Color:
     return (1.0 - a) * Color(1.0, 1.0, 1.0) + a * Color(0.5, 0.7, 1.0)
 
 
-def main() -> None:
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", nargs="?", help="Output image (.ppm, .png or .pfm)")
+    parser.add_argument(
+        "--scene", help="Load the scene and camera from a .json or .rtscene file"
+    )
+    parser.add_argument(
+        "--save-scene", metavar="PATH", help="Save the scene and camera, then exit"
+    )
+    parser.add_argument("--width", type=int, help="Image width")
+    parser.add_argument(
+        "--samples", type=int, help="Samples per pixel (cap if adaptive)"
+    )
+    parser.add_argument(
+        "--wavefront",
+        action="store_true",
+        help="Use the batched NumPy renderer instead of the scalar one",
+    )
+    parser.add_argument(
+        "--bvh", action="store_true", help="Wrap the world in a BVH before rendering"
+    )
+    parser.add_argument(
+        "--cull",
+        action="store_true",
+        help="Test primary rays only against objects in their tile's frustum",
+    )
+    parser.add_argument(
+        "--sphere-set",
+        type=float,
+        nargs="?",
+        const=1.0,
+        metavar="MAX_RADIUS",
+        help="Collapse spheres up to MAX_RADIUS (default 1) into one SphereSet",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Render seeded tiles on this many processes"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Render seeded tiles on this many threads sharing the world",
+    )
+    parser.add_argument("--tile-size", type=int, default=16, help="Tile size in pixels")
+    parser.add_argument(
+        "--adaptive",
+        type=float,
+        metavar="TOLERANCE",
+        help="Sample each pixel until its relative error drops below TOLERANCE",
+    )
+    parser.add_argument(
+        "--aov",
+        metavar="PREFIX",
+        help="Write first-hit normal, albedo, depth and variance as PREFIX_*.pfm",
+    )
+    parser.add_argument(
+        "--denoise",
+        action="store_true",
+        help="Denoise the render using its first-hit buffers (needs NumPy)",
+    )
+    parser.add_argument("--heatmap", help="Write adaptive sample counts to this image")
+    parser.add_argument(
+        "--integrator",
+        choices=["recursive", "iterative"],
+        default="recursive",
+        help="Path integrator; iterative supports Russian roulette",
+    )
+    parser.add_argument(
+        "--sampler",
+        choices=["random", "stratified", "halton", "sobol"],
+        default="random",
+        help="Sample pattern for pixel, lens and first-bounce dimensions",
+    )
+    parser.add_argument(
+        "--rr-depth",
+        type=int,
+        default=3,
+        help="Bounce at which Russian roulette starts (negative disables)",
+    )
+    parser.add_argument(
+        "--accumulate",
+        metavar="PATH",
+        help="Render in passes into this resumable accumulation file",
+    )
+    parser.add_argument(
+        "--samples-per-pass", type=int, default=4, help="Samples per pixel per pass"
+    )
+    parser.add_argument(
+        "--progressive",
+        metavar="PREVIEW",
+        help="Render a coarse preview, then refining passes, rewriting PREVIEW",
+    )
+    parser.add_argument(
+        "--preview-stride",
+        type=int,
+        default=8,
+        help="Pixels per side of a block in the first progressive preview",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Render passes for this long (--samples becomes a cap)",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="HOST:PORT",
+        help="Coordinate a distributed render; workers run distributed.py",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="Start this many distributed workers on this machine",
+    )
+    parser.add_argument("--seed", type=int, help="Seed for scene and sampling")
+    parser.add_argument("--stats", metavar="PATH", help="Write render stats as JSON")
+    parser.add_argument(
+        "--profile", metavar="PATH", help="Run the render under cProfile and save it"
+    )
+    args = parser.parse_args()
+    if not args.output and not args.save_scene:
+        parser.error("an output image is required")
+    # Render modes; `main` runs exactly one, so asking for two is an error
+    modes = [
+        flag
+        for flag, used in (
+            ("--wavefront", args.wavefront),
+            ("--adaptive", args.adaptive is not None),
+            ("--serve/--local-workers", args.serve or args.local_workers),
+            ("--progressive", args.progressive),
+            ("--accumulate", args.accumulate),
+            ("--deadline", args.deadline is not None),
+            ("--threads", args.threads),
+            ("--workers", args.workers),
+        )
+        if used
+    ]
+    if len(modes) > 1:
+        parser.error(f"{' and '.join(modes)} cannot be combined")
+    if (args.aov or args.denoise) and modes not in ([], ["--adaptive"]):
+        parser.error("--aov and --denoise only work with the plain or adaptive render")
+    if args.heatmap and args.adaptive is None:
+        parser.error("--heatmap only works with --adaptive")
+    if (
+        args.deadline is not None
+        and args.samples
+        and args.samples % args.samples_per_pass
+    ):
+        parser.error(
+            "--samples must be a multiple of --samples-per-pass with --deadline"
+        )
+    return args
+
+
+def random_scene() -> HittableList:
     world = HittableList()
     ground_material = Lambertian(Color(0.5, 0.5, 0.5))
     world.add(Sphere(Point3(0, -1000, 0), 1000, ground_material))
 
     for a in range(-11, 11):
         for b in range(-11, 11):
-            choose_mat = random.random()
-            center = Point3(a + 0.9 * random.random(), 0.2, b + 0.9 * random.random())
+            choose_mat = rng.random()
+            center = Point3(a + 0.9 * rng.random(), 0.2, b + 0.9 * rng.random())
 
             sphere_material: Lambertian | Metal | Dielectric
             if (center - Point3(4, 0.2, 0)).length() > 0.9:
@@ -47,7 +212,7 @@ def main() -> None:
                 elif choose_mat < 0.95:
                     # metal
                     albedo = Color.random(0.5, 1)
-                    fuzz = random.uniform(0, 0.5)
+                    fuzz = rng.uniform(0, 0.5)
                     sphere_material = Metal(albedo, fuzz)
                     world.add(Sphere(center, 0.2, sphere_material))
                 else:
@@ -64,6 +229,11 @@ def main() -> None:
     material3 = Metal(Color(0.7, 0.6, 0.5), 0.0)
     world.add(Sphere(Point3(4, 1, 0), 1.0, material3))
 
+    return world
+
+
+def scene_camera() -> Camera:
+    # Camera for `random_scene`, before `setup()`
     cam = Camera()
 
     cam.aspect_ratio = 16.0 / 9.0
@@ -78,19 +248,119 @@ def main() -> None:
     # Adjust for higher image quality
     cam.samples_per_pixel = 100
     cam.max_depth = 50
+    return cam
+
+
+def preview_writer(path: str) -> Callable[[Framebuffer], None]:
+    start = time.perf_counter()
+    previews = 0
+
+    def write(fb: Framebuffer) -> None:
+        nonlocal previews
+        fb.write_atomic(path)
+        previews += 1
+        elapsed = time.perf_counter() - start
+        print(f"\nPreview {previews} written to {path} after {elapsed:.1f}s")
+
+    return write
+
+
+def main() -> None:
+    args = parse_args()
+    rng.seed(args.seed)
+
+    if args.scene:
+        # Loaded spheres go straight into the set; a scene being saved is
+        # kept as plain spheres
+        sphere_set = None if args.save_scene else args.sphere_set
+        world, cam = load_scene(args.scene, sphere_set)
+    else:
+        world, cam = random_scene(), scene_camera()
+    if args.width:
+        cam.image_width = args.width
+    if args.samples:
+        cam.samples_per_pixel = args.samples
+
+    if args.save_scene:
+        save_scene(args.save_scene, world, cam)
+        return
+
+    if args.sphere_set is not None and not args.scene:
+        from sphereset import collapse
+
+        world = collapse(world, args.sphere_set)
+    scene: Hittable = BVHNode(world) if args.bvh else world
+    cam.seed = args.seed
+    cam.workers = args.workers or args.threads or 1
+    cam.tile_size = args.tile_size
+    cam.frustum_cull = args.cull
+    cam.integrator = args.integrator
+    cam.sampling = args.sampler
+    cam.rr_min_depth = args.rr_depth if args.rr_depth >= 0 else None
+    cam.samples_per_pass = args.samples_per_pass
+    cam.preview_stride = args.preview_stride
+    if args.stats:
+        cam.stats = RenderStats()
+    if args.aov or args.denoise:
+        cam.aov = AOVBuffers(0, 0)
 
     # Configure camera w/above parameters
     cam.setup()
+    # Building the scene procedurally draws from the stream and loading it
+    # does not, so start the render from the same state either way
+    rng.seed(args.seed)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    if args.wavefront:
+        framebuffer = cam.render_wavefront(scene)
+    elif args.adaptive is not None:
+        cam.adaptive_tolerance = args.adaptive
+        framebuffer = cam.render_adaptive(scene)
+    elif args.serve or args.local_workers:
+        host, port = parse_address(args.serve or "127.0.0.1:0")
+        framebuffer = render_distributed(cam, scene, args.local_workers, host, port)
+    elif args.progressive:
+        framebuffer = cam.render_progressive(scene, preview_writer(args.progressive))
+    elif args.accumulate:
+        framebuffer = cam.render_passes(scene, args.accumulate)
+    elif args.deadline is not None:
+        framebuffer = cam.render_deadline(scene, args.deadline, args.samples)
+    elif args.threads:
+        framebuffer = cam.render_threaded(scene)
+    elif args.workers:
+        framebuffer = cam.render_parallel(scene)
+    else:
+        framebuffer = cam.render(scene)
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+    if cam.aov is not None:
+        if args.aov:
+            cam.aov.write(args.aov)
+        if args.denoise:
+            from denoise import denoise
+
+            start = time.perf_counter()
+            framebuffer = denoise(framebuffer, cam.aov)
+            print(f"\nDenoised in {time.perf_counter() - start:.2f}s")
 
-    if len(sys.argv) < 2:
-        print("Error: Pass output .ppm file as argument")
-        raise SystemExit(1)
+    framebuffer.write(args.output)
+    if cam.stats is not None:
+        cam.stats.write_json(args.stats)
 
-    with open(sys.argv[1], "w") as f:
-        # ppm header
-        f.write(f"P3\n{cam.image_width} {cam.image_height}\n255\n")
-        for px in cam.render(world):
-            f.write(f"{px[0]} {px[1]} {px[2]}\n")
+    if args.adaptive is not None or args.deadline is not None:
+        spp = sum(cam.sample_counts) / len(cam.sample_counts)
+        low, high = min(cam.sample_counts), max(cam.sample_counts)
+        print(f"\nAverage samples per pixel: {spp:.1f} ({low} to {high})")
+        if args.heatmap:
+            cam.sample_heatmap().write(args.heatmap)
 
 
 if __name__ == "__main__":
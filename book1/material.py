@@ -2,14 +2,39 @@ from abc import ABC, abstractmethod
 from ray import Ray
 from hittable import HitRecord
 from color import Color
-from vec3 import random_unit_vector, reflect, refract, unit_vector, dot, Vec3
+from vec3 import (
+    random_unit_vector,
+    reflect,
+    refract,
+    square_to_unit_vector,
+    unit_vector,
+    dot,
+    Vec3,
+)
+from typing import Tuple
 import math
-import random
+from rng import random
 
 
 class Material(ABC):
+    # Reflectance reported to the denoiser's albedo buffer; materials that
+    # tint light replace it with their own
+    albedo: Color = Color(1.0, 1.0, 1.0)
+    # Specular materials let the denoiser's buffers look through to the next
+    # hit, see `aov.AOVBuffers`
+    specular: bool = False
+
+    # `sample` is an optional point in [0, 1)^2 from a camera sampler; without
+    # one, materials draw their own random numbers
     @abstractmethod
-    def scatter(self, r_in: Ray, rec: HitRecord, attenuation: Color, scattered) -> bool:
+    def scatter(
+        self,
+        r_in: Ray,
+        rec: HitRecord,
+        attenuation: Color,
+        scattered,
+        sample: Tuple[float, float] | None = None,
+    ) -> bool:
         pass
 
 
@@ -20,9 +45,17 @@ class Lambertian(Material):
         self.albedo = a
 
     def scatter(
-        self, r_in: Ray, rec: HitRecord, attenuation: Color, scattered: Ray
+        self,
+        r_in: Ray,
+        rec: HitRecord,
+        attenuation: Color,
+        scattered: Ray,
+        sample: Tuple[float, float] | None = None,
     ) -> bool:
-        scatter_dir = rec.normal + random_unit_vector()
+        scatter_dir = (
+            random_unit_vector() if sample is None else square_to_unit_vector(*sample)
+        )
+        scatter_dir += rec.normal
         # Correct scatter if close to zero
         if scatter_dir.near_zero():
             scatter_dir = rec.normal
@@ -39,16 +72,25 @@ class Lambertian(Material):
 class Metal(Material):
     albedo: Color
     fuzz: float
+    specular = True
 
     def __init__(self, a: Color, f: float) -> None:
         self.albedo = a
         self.fuzz = f if f < 1 else 1
 
     def scatter(
-        self, r_in: Ray, rec: HitRecord, attenuation: Color, scattered: Ray
+        self,
+        r_in: Ray,
+        rec: HitRecord,
+        attenuation: Color,
+        scattered: Ray,
+        sample: Tuple[float, float] | None = None,
     ) -> bool:
         reflected: Vec3 = reflect(unit_vector(r_in.direction), rec.normal)
-        scattered.direction = reflected + self.fuzz * random_unit_vector()
+        fuzz = (
+            random_unit_vector() if sample is None else square_to_unit_vector(*sample)
+        )
+        scattered.direction = reflected.add_scaled(fuzz, self.fuzz)
         scattered.origin = rec.p
         attenuation.x = self.albedo.x
         attenuation.y = self.albedo.y
@@ -58,12 +100,18 @@ class Metal(Material):
 
 class Dielectric(Material):
     index_of_refraction: float
+    specular = True
 
     def __init__(self, index_of_refraction: float) -> None:
         self.ir = index_of_refraction
 
     def scatter(
-        self, r_in: Ray, rec: HitRecord, attenuation: Color, scattered: Ray
+        self,
+        r_in: Ray,
+        rec: HitRecord,
+        attenuation: Color,
+        scattered: Ray,
+        sample: Tuple[float, float] | None = None,
     ) -> bool:
         attenuation.x = 1.0
         attenuation.y = 1.0
@@ -72,11 +120,12 @@ class Dielectric(Material):
         refraction_ratio = (1.0 / self.ir) if rec.front_face else self.ir
         unit_direction = unit_vector(r_in.direction)
 
-        cos_theta = min(dot(-unit_direction, rec.normal), 1.0)
+        cos_theta = min(-dot(unit_direction, rec.normal), 1.0)
         sin_theta = math.sqrt(max(0.0, 1.0 - cos_theta * cos_theta))
 
         cannot_refract = refraction_ratio * sin_theta > 1.0
-        if cannot_refract or reflectance(cos_theta, refraction_ratio) > random.random():
+        u = random() if sample is None else sample[0]
+        if cannot_refract or reflectance(cos_theta, refraction_ratio) > u:
             direction = reflect(unit_direction, rec.normal)
         else:
             direction = refract(unit_direction, rec.normal, refraction_ratio)
@@ -11,5 +11,13 @@ class Ray:
         self.origin = origin or Point3()
         self.direction = direction or Vec3()
 
-    def at(self, t: float) -> Point3:
-        return self.origin + self.direction * t
+    def at(self, t: float, out: Point3 | None = None) -> Point3:
+        # Writes into `out` when given, to skip allocating a new point
+        o = self.origin
+        d = self.direction
+        if out is None:
+            return Point3(o.x + d.x * t, o.y + d.y * t, o.z + d.z * t)
+        out.x = o.x + d.x * t
+        out.y = o.y + d.y * t
+        out.z = o.z + d.z * t
+        return out
@@ -0,0 +1,189 @@
+"""
+Pixel samplers
+
+A sampler hands the camera points in [0, 1)^2 for each sample of a pixel, one
+per dimension: the position inside the pixel, the position on the lens and the
+first-bounce scatter direction. Independent random points need many more
+samples to reach a given noise level than stratified or low-discrepancy ones.
+
+Every pixel gets its own scramble, derived from the render seed and the pixel
+coordinates, so a pixel's sequence does not depend on the order pixels are
+rendered in: tiles, workers and accumulation passes all see the same points.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple, Type
+import math
+import random as _random
+from rng import random
+
+PIXEL = 0
+LENS = 1
+BOUNCE = 2
+DIMENSIONS = 3
+
+# Largest float below 1, so scrambled points never round up to 1
+ONE_MINUS_EPSILON = 1.0 - 2.0**-53
+
+# Halton bases for each dimension: the first six primes
+HALTON_BASES = [(2, 3), (5, 7), (11, 13)]
+
+
+def mix32(*values: int) -> int:
+    # FNV-1a over the values, finished with the MurmurHash3 avalanche
+    h = 0x811C9DC5
+    for v in values:
+        h = ((h ^ (v & 0xFFFFFFFF)) * 0x01000193) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h
+
+
+def to_unit(v: int) -> float:
+    return v * 2.0**-32
+
+
+def reverse_bits(v: int) -> int:
+    return int(f"{v:032b}"[::-1], 2)
+
+
+def laine_karras_permutation(v: int, seed: int) -> int:
+    v = (v + seed) & 0xFFFFFFFF
+    v ^= (v * 0x6C50B47C) & 0xFFFFFFFF
+    v ^= (v * 0xB82F1E52) & 0xFFFFFFFF
+    v ^= (v * 0xC7AFE638) & 0xFFFFFFFF
+    v ^= (v * 0x8D22F6E6) & 0xFFFFFFFF
+    return v
+
+
+def owen_scramble(v: int, seed: int) -> int:
+    # Hash-based nested uniform scramble (Burley 2020): randomises the points
+    # while keeping every power-of-two stratum of the sequence filled
+    return reverse_bits(laine_karras_permutation(reverse_bits(v), seed))
+
+
+def sobol_2d(index: int) -> Tuple[int, int]:
+    # First two Sobol dimensions as 32-bit integers: van der Corput, and the
+    # dimension generated by the primitive polynomial x + 1
+    x = reverse_bits(index)
+    y = 0
+    v = 1 << 31
+    while index:
+        if index & 1:
+            y ^= v
+        index >>= 1
+        v ^= v >> 1
+    return x, y
+
+
+def radical_inverse(base: int, index: int) -> float:
+    inv_base = 1.0 / base
+    scale = inv_base
+    result = 0.0
+    while index:
+        index, digit = divmod(index, base)
+        result += digit * scale
+        scale *= inv_base
+    return result
+
+
+class Sampler(ABC):
+    seed: int
+    samples_per_pixel: int
+    # Index of the current sample within the pixel
+    index: int
+    pixel_seed: int
+
+    def __init__(self, seed: int | None = None, samples_per_pixel: int = 1) -> None:
+        self.seed = seed or 0
+        self.samples_per_pixel = samples_per_pixel
+        self.index = -1
+        self.pixel_seed = 0
+
+    def start_pixel(self, i: int, j: int, first_sample: int = 0) -> None:
+        # `first_sample` lets a pass-based render carry on where the last
+        # pass stopped
+        self.index = first_sample - 1
+        self.pixel_seed = mix32(self.seed, i, j)
+
+    def next_sample(self) -> None:
+        self.index += 1
+
+    @abstractmethod
+    def get_2d(self, dim: int) -> Tuple[float, float]:
+        pass
+
+
+class IndependentSampler(Sampler):
+    def get_2d(self, dim: int) -> Tuple[float, float]:
+        return random(), random()
+
+
+class StratifiedSampler(Sampler):
+    # Jittered n x n grid per dimension with n = ceil(sqrt(spp)). Each
+    # dimension visits the cells in its own shuffled order, so the dimensions
+    # are not correlated with each other.
+    strata: int
+    order: List[List[int]]
+
+    def __init__(self, seed: int | None = None, samples_per_pixel: int = 1) -> None:
+        super().__init__(seed, samples_per_pixel)
+        self.strata = math.ceil(math.sqrt(samples_per_pixel))
+        self.order = []
+
+    def start_pixel(self, i: int, j: int, first_sample: int = 0) -> None:
+        super().start_pixel(i, j, first_sample)
+        cells = self.strata * self.strata
+        self.order = []
+        for dim in range(DIMENSIONS):
+            order = list(range(cells))
+            _random.Random(mix32(self.pixel_seed, dim)).shuffle(order)
+            self.order.append(order)
+
+    def get_2d(self, dim: int) -> Tuple[float, float]:
+        order = self.order[dim]
+        cell = order[self.index % len(order)]
+        y, x = divmod(cell, self.strata)
+        inv = 1.0 / self.strata
+        return (x + random()) * inv, (y + random()) * inv
+
+
+class HaltonSampler(Sampler):
+    # Halton points with a per-pixel Cranley-Patterson rotation
+    def get_2d(self, dim: int) -> Tuple[float, float]:
+        bx, by = HALTON_BASES[dim]
+        k = self.index + 1
+        sx = to_unit(mix32(self.pixel_seed, dim, 0))
+        sy = to_unit(mix32(self.pixel_seed, dim, 1))
+        x = (radical_inverse(bx, k) + sx) % 1.0
+        y = (radical_inverse(by, k) + sy) % 1.0
+        return min(x, ONE_MINUS_EPSILON), min(y, ONE_MINUS_EPSILON)
+
+
+class SobolSampler(Sampler):
+    # Owen-scrambled (0, 2)-sequence per dimension, with the sample index
+    # shuffled per dimension to decorrelate the dimensions. Best with a
+    # power-of-two number of samples per pixel.
+    def get_2d(self, dim: int) -> Tuple[float, float]:
+        seed = mix32(self.pixel_seed, dim)
+        index = owen_scramble(self.index & 0xFFFFFFFF, seed)
+        x, y = sobol_2d(index)
+        x = owen_scramble(x, mix32(seed, 1))
+        y = owen_scramble(y, mix32(seed, 2))
+        return to_unit(x), to_unit(y)
+
+
+SAMPLERS: Dict[str, Type[Sampler]] = {
+    "random": IndependentSampler,
+    "stratified": StratifiedSampler,
+    "halton": HaltonSampler,
+    "sobol": SobolSampler,
+}
+
+
+def make_sampler(name: str, seed: int | None, samples_per_pixel: int) -> Sampler:
+    if name not in SAMPLERS:
+        raise ValueError(f"Unknown sampler: {name}")
+    return SAMPLERS[name](seed, samples_per_pixel)
@@ -0,0 +1,278 @@
+"""
+Scene files
+
+Two formats describe the same thing: a camera, a material table and a list of
+spheres that index into it.
+
+JSON (.json), for small hand-written scenes:
+
+    {
+      "camera": {"image_width": 400, "lookfrom": [13, 2, 3], ...},
+      "materials": [
+        {"type": "lambertian", "albedo": [0.5, 0.5, 0.5]},
+        {"type": "metal", "albedo": [0.7, 0.6, 0.5], "fuzz": 0.0},
+        {"type": "dielectric", "ir": 1.5}
+      ],
+      "spheres": [{"center": [0, -1000, 0], "radius": 1000, "material": 0}, ...]
+    }
+
+Binary (.rtscene), for large scenes: the magic bytes, a little-endian u32
+header length and a JSON header holding the camera, the material table and
+the sphere count, followed by struct-of-arrays little-endian data: float64
+centres (x, y, z interleaved), float64 radii and uint32 material indices.
+"""
+from array import array
+from aabb import AABB
+from camera import Camera
+from color import Color
+from hittable import Hittable, HittableList
+from interval import Interval
+from material import Dielectric, Lambertian, Material, Metal
+from sphere import Sphere
+from vec3 import Point3, Vec3
+from typing import Any, Dict, List, Tuple
+import json
+import struct
+import sys
+
+MAGIC = b"RTSCENE1"
+
+# Camera attributes stored in scene files
+CAMERA_FIELDS = [
+    "aspect_ratio",
+    "image_width",
+    "samples_per_pixel",
+    "max_depth",
+    "vfov",
+    "defocus_angle",
+    "focus_dist",
+]
+CAMERA_VECTORS = ["lookfrom", "lookat", "vup"]
+
+
+def camera_to_dict(cam: Camera) -> Dict[str, Any]:
+    d: Dict[str, Any] = {name: getattr(cam, name) for name in CAMERA_FIELDS}
+    for name in CAMERA_VECTORS:
+        v = getattr(cam, name)
+        d[name] = [v.x, v.y, v.z]
+    return d
+
+
+def camera_from_dict(d: Dict[str, Any]) -> Camera:
+    cam = Camera()
+    for name in CAMERA_FIELDS:
+        if name in d:
+            setattr(cam, name, d[name])
+    for name in CAMERA_VECTORS:
+        if name in d:
+            setattr(cam, name, Vec3(*d[name]))
+    return cam
+
+
+def material_to_dict(mat: Material) -> Dict[str, Any]:
+    if isinstance(mat, Lambertian):
+        a = mat.albedo
+        return {"type": "lambertian", "albedo": [a.x, a.y, a.z]}
+    if isinstance(mat, Metal):
+        a = mat.albedo
+        return {"type": "metal", "albedo": [a.x, a.y, a.z], "fuzz": mat.fuzz}
+    if isinstance(mat, Dielectric):
+        return {"type": "dielectric", "ir": mat.ir}
+    raise TypeError(f"Unsupported material: {mat.__class__.__name__}")
+
+
+def material_from_dict(d: Dict[str, Any]) -> Material:
+    kind = d["type"]
+    if kind == "lambertian":
+        return Lambertian(Color(*d["albedo"]))
+    if kind == "metal":
+        return Metal(Color(*d["albedo"]), d["fuzz"])
+    if kind == "dielectric":
+        return Dielectric(d["ir"])
+    raise ValueError(f"Unknown material type: {kind}")
+
+
+def spheres_in(world: Hittable) -> List[Sphere]:
+    if isinstance(world, Sphere):
+        return [world]
+    if isinstance(world, HittableList):
+        return [s for obj in world.objects for s in spheres_in(obj)]
+    if hasattr(world, "spheres"):
+        # `SphereSet`, without importing NumPy here
+        return world.spheres()
+    raise TypeError(f"Unsupported hittable: {world.__class__.__name__}")
+
+
+def to_arrays(
+    world: Hittable,
+) -> Tuple[List[Dict[str, Any]], array, array, array]:
+    # Struct-of-arrays view of the world with a deduplicated material table
+    materials: List[Dict[str, Any]] = []
+    lookup: Dict[int, int] = {}
+    centers = array("d")
+    radii = array("d")
+    mat_index = array("I")
+    for s in spheres_in(world):
+        if id(s.mat) not in lookup:
+            lookup[id(s.mat)] = len(materials)
+            materials.append(material_to_dict(s.mat))
+        centers.extend((s.center.x, s.center.y, s.center.z))
+        radii.append(s.radius)
+        mat_index.append(lookup[id(s.mat)])
+    return materials, centers, radii, mat_index
+
+
+def from_arrays(
+    materials: List[Dict[str, Any]],
+    centers: array,
+    radii: array,
+    mat_index: array,
+    sphere_set: float | None = None,
+) -> HittableList:
+    # Builds the world in one pass, with the bounding box taken straight
+    # from the arrays rather than grown one sphere at a time. With
+    # `sphere_set`, spheres up to that radius go straight from the arrays
+    # into one `SphereSet`, as `sphereset.collapse` would put them, without
+    # a `Sphere` object each.
+    mats = [material_from_dict(m) for m in materials]
+    if sphere_set is not None:
+        # Imported here so NumPy is only needed for sphere sets
+        import numpy as np
+        from sphereset import SphereSet
+
+        r = np.frombuffer(radii, dtype=np.float64)
+        small = np.abs(r) <= sphere_set
+        if np.count_nonzero(small) >= 2:
+            c = np.frombuffer(centers, dtype=np.float64).reshape(-1, 3)
+            m = np.frombuffer(mat_index, dtype=np.uint32)
+            big = ~small
+            world = sphere_list(
+                mats,
+                to_array("d", c[big]),
+                to_array("d", r[big]),
+                to_array("I", m[big]),
+            )
+            world.add(SphereSet(c[small], r[small], m[small], mats))
+            return world
+    return sphere_list(mats, centers, radii, mat_index)
+
+
+def to_array(typecode: str, values: Any) -> array:
+    # A NumPy array's contents as a stdlib array
+    a = array(typecode)
+    a.frombytes(values.tobytes())
+    return a
+
+
+def sphere_list(
+    mats: List[Material], centers: array, radii: array, mat_index: array
+) -> HittableList:
+    n = len(radii)
+    xs, ys, zs = centers[0::3], centers[1::3], centers[2::3]
+    world = HittableList()
+    if not n:
+        return world
+    spheres: List[Hittable] = [
+        Sphere(Point3(x, y, z), r, mats[m])
+        for x, y, z, r, m in zip(xs, ys, zs, radii, mat_index)
+    ]
+    extent = [abs(r) for r in radii]
+    bbox = AABB(
+        Interval(min(map(float.__sub__, xs, extent)), max(map(float.__add__, xs, extent))),
+        Interval(min(map(float.__sub__, ys, extent)), max(map(float.__add__, ys, extent))),
+        Interval(min(map(float.__sub__, zs, extent)), max(map(float.__add__, zs, extent))),
+    )
+    world.extend(spheres, bbox)
+    return world
+
+
+def little_endian(a: array) -> array:
+    if sys.byteorder == "big":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+def save_scene(path: str, world: Hittable, cam: Camera) -> None:
+    materials, centers, radii, mat_index = to_arrays(world)
+    if path.endswith(".json"):
+        spheres = [
+            {
+                "center": list(centers[3 * k : 3 * k + 3]),
+                "radius": radii[k],
+                "material": mat_index[k],
+            }
+            for k in range(len(radii))
+        ]
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "camera": camera_to_dict(cam),
+                    "materials": materials,
+                    "spheres": spheres,
+                },
+                f,
+            )
+        return
+
+    write_binary(path, camera_to_dict(cam), materials, centers, radii, mat_index)
+
+
+def write_binary(
+    path: str,
+    camera: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    centers: array,
+    radii: array,
+    mat_index: array,
+) -> None:
+    header = json.dumps(
+        {"camera": camera, "materials": materials, "count": len(radii)}
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for a in (centers, radii, mat_index):
+            f.write(little_endian(a).tobytes())
+
+
+def read_arrays(
+    path: str,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], array, array, array]:
+    # Camera dict, material table and the sphere arrays of a scene file
+    if path.endswith(".json"):
+        with open(path) as f:
+            d = json.load(f)
+        spheres = d.get("spheres", [])
+        centers = array("d", [c for s in spheres for c in s["center"]])
+        radii = array("d", [float(s["radius"]) for s in spheres])
+        mat_index = array("I", [s["material"] for s in spheres])
+        return d.get("camera", {}), d["materials"], centers, radii, mat_index
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a scene file")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+        n = header["count"]
+        centers = array("d")
+        radii = array("d")
+        mat_index = array("I")
+        centers.frombytes(f.read(24 * n))
+        radii.frombytes(f.read(8 * n))
+        mat_index.frombytes(f.read(4 * n))
+    if len(mat_index) != n:
+        raise ValueError(f"{path} is truncated")
+    centers, radii, mat_index = map(little_endian, (centers, radii, mat_index))
+    return header["camera"], header["materials"], centers, radii, mat_index
+
+
+def load_scene(
+    path: str, sphere_set: float | None = None
+) -> Tuple[HittableList, Camera]:
+    # `sphere_set` is the largest radius to load into a `SphereSet`, see
+    # `from_arrays`
+    camera, materials, centers, radii, mat_index = read_arrays(path)
+    world = from_arrays(materials, centers, radii, mat_index, sphere_set)
+    return world, camera_from_dict(camera)
@@ -0,0 +1,394 @@
+"""
+Local render service
+
+A long-lived asyncio server that keeps worker processes and built scenes warm
+between requests. A client sends one job and gets tiles back as they finish,
+then a final message; finished images go into a size-bounded, content-addressed
+disk cache, so asking for the same image again streams it straight back.
+
+Messages are length-prefixed JSON (a big-endian u64 size, then UTF-8), with
+pixel data as base64 little-endian float64 RGB. A job looks like:
+
+    {"scene_path": "scene.rtscene",        # or "scene": {inline JSON scene}
+     "camera": {"image_width": 400, ...},  # laid over the scene's camera
+     "seed": 1, "bvh": true, "tile_size": 16}
+
+and is answered by {"type": "tile", "tile": n, "bounds": [x0, y0, x1, y1],
+"pixels": ...} messages and a {"type": "done", "cached": bool, "key": ...}.
+
+Usage: python service.py serve [--port 8765] [--cache DIR] [--cache-mb 512]
+       python service.py render JOB.json OUT.png [--port 8765]
+"""
+from array import array
+from bvh import BVHNode
+from camera import Camera
+from concurrent.futures import ProcessPoolExecutor
+from framebuffer import Framebuffer
+from hittable import Hittable
+from scene import camera_from_dict, camera_to_dict, load_scene
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+FRAME = struct.Struct(">Q")
+
+# Built worlds each worker process keeps around between jobs
+MAX_WARM_SCENES = 4
+
+_service_worlds: Dict[str, Hittable] = {}
+
+
+async def read_message(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return json.loads(await reader.readexactly(size))
+
+
+async def write_message(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    payload = json.dumps(message).encode()
+    writer.write(FRAME.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+def encode_pixels(data: array) -> str:
+    if sys.byteorder == "big":
+        data = array("d", data)
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode()
+
+
+def decode_pixels(text: str) -> array:
+    data = array("d", base64.b64decode(text))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def digest(*parts: bytes) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    # The temp name is unique per thread as well as per process, since
+    # executor threads may write the same path at once
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ResultCache:
+    # Finished images on disk, named by the hash of everything that decides
+    # their pixels. Reads refresh a file's mtime and writes evict the least
+    # recently used files until the cache fits in `max_bytes`. Jobs put from
+    # executor threads at once, so a file that vanishes mid-eviction is
+    # skipped.
+    directory: str
+    max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        write_atomic(self.path(key), data)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _render_service_tile(
+    scene_key: str, scene_path: str, bvh: bool, camera: Dict[str, Any], tile_id: int
+) -> bytes:
+    # Runs in a worker process, which builds each scene once and keeps it
+    world = _service_worlds.pop(scene_key, None)
+    if world is None:
+        world, _ = load_scene(scene_path)
+        if bvh:
+            world = BVHNode(world)
+        while len(_service_worlds) >= MAX_WARM_SCENES:
+            del _service_worlds[next(iter(_service_worlds))]
+    # Most recently used last
+    _service_worlds[scene_key] = world
+
+    cam = make_camera(camera)
+    pixels = cam.render_tile(world, tile_id)
+    return array("d", [c for p in pixels for c in (p.x, p.y, p.z)]).tobytes()
+
+
+# Render settings a job may set besides the scene file camera keys
+RENDER_FIELDS = ["seed", "tile_size", "sampling", "integrator"]
+
+
+def make_camera(camera: Dict[str, Any]) -> Camera:
+    cam = camera_from_dict(camera)
+    for name in RENDER_FIELDS:
+        if name in camera:
+            setattr(cam, name, camera[name])
+    cam.setup()
+    return cam
+
+
+class RenderService:
+    cache: ResultCache
+    executor: ProcessPoolExecutor
+    scene_dir: str
+
+    def __init__(self, cache_dir: str, cache_bytes: int, workers: int | None = None):
+        self.cache = ResultCache(os.path.join(cache_dir, "images"), cache_bytes)
+        self.scene_dir = os.path.join(cache_dir, "scenes")
+        os.makedirs(self.scene_dir, exist_ok=True)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Scene hash and camera for each scene file, so a file is only read
+        # again when it changes
+        self.scenes: Dict[Tuple[str, float, int], Tuple[str, Dict[str, Any]]] = {}
+
+    def resolve_scene(self, job: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+        # Returns (scene hash, path the workers load, scene camera)
+        if "scene" in job:
+            text = json.dumps(job["scene"], sort_keys=True).encode()
+            key = digest(text)
+            path = os.path.join(self.scene_dir, f"{key}.json")
+            if not os.path.exists(path):
+                write_atomic(path, text)
+        else:
+            path = os.path.abspath(job["scene_path"])
+
+        st = os.stat(path)
+        stamp = (path, st.st_mtime, st.st_size)
+        if stamp not in self.scenes:
+            with open(path, "rb") as f:
+                key = digest(f.read())
+            _, cam = load_scene(path)
+            self.scenes[stamp] = (key, camera_to_dict(cam))
+        key, camera = self.scenes[stamp]
+        return key, path, camera
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            job = await read_message(reader)
+            await self.render(job, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (KeyError, ValueError, TypeError, OSError) as e:
+            await write_message(writer, {"type": "error", "message": str(e)})
+        finally:
+            writer.close()
+
+    async def render(self, job: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        # Reading and hashing a large scene file is slow too
+        scene_key, scene_path, scene_camera = await loop.run_in_executor(
+            None, self.resolve_scene, job
+        )
+        bvh = bool(job.get("bvh", False))
+        camera = {**scene_camera, **job.get("camera", {})}
+        for name in RENDER_FIELDS:
+            if name in job:
+                camera[name] = job[name]
+        key = digest(
+            json.dumps({"scene": scene_key, "camera": camera}, sort_keys=True).encode()
+        )
+
+        cam = make_camera(camera)
+        tiles = cam.tiles()
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            fb = Framebuffer(cam.image_width, cam.image_height)
+            fb.data = array("d", cached)
+            for n, bounds in enumerate(tiles):
+                pixels = crop(fb, bounds)
+                await write_message(writer, tile_message(n, bounds, pixels))
+            await write_message(writer, {"type": "done", "cached": True, "key": key})
+            return
+
+        fb = Framebuffer(cam.image_width, cam.image_height)
+        world_key = f"{scene_key}:{bvh}"
+
+        async def render_tile(n: int) -> Tuple[int, bytes]:
+            data = await loop.run_in_executor(
+                self.executor,
+                _render_service_tile,
+                world_key,
+                scene_path,
+                bvh,
+                camera,
+                n,
+            )
+            return n, data
+
+        # Keep rendering if the client goes away, so the image still gets cached
+        connected = True
+        pending = [render_tile(n) for n in range(len(tiles))]
+        for done in asyncio.as_completed(pending):
+            n, data = await done
+            pixels = array("d", data)
+            paste(fb, tiles[n], pixels)
+            if connected:
+                try:
+                    await write_message(writer, tile_message(n, tiles[n], pixels))
+                except ConnectionError:
+                    connected = False
+
+        await loop.run_in_executor(None, self.cache.put, key, fb.data.tobytes())
+        if connected:
+            await write_message(writer, {"type": "done", "cached": False, "key": key})
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Render service listening on {address[0]}:{address[1]}")
+        async with server:
+            await server.serve_forever()
+
+
+def crop(fb: Framebuffer, bounds: Tuple[int, int, int, int]) -> array:
+    x0, y0, x1, y1 = bounds
+    pixels = array("d")
+    for j in range(y0, y1):
+        k = 3 * (j * fb.width + x0)
+        pixels.extend(fb.data[k : k + 3 * (x1 - x0)])
+    return pixels
+
+
+def paste(fb: Framebuffer, bounds: Tuple[int, int, int, int], pixels: array) -> None:
+    x0, y0, x1, y1 = bounds
+    stride = 3 * (x1 - x0)
+    for j in range(y0, y1):
+        k = 3 * (j * fb.width + x0)
+        fb.data[k : k + stride] = pixels[(j - y0) * stride : (j - y0 + 1) * stride]
+
+
+def tile_message(
+    n: int, bounds: Tuple[int, int, int, int], pixels: array
+) -> Dict[str, Any]:
+    return {
+        "type": "tile",
+        "tile": n,
+        "bounds": list(bounds),
+        "pixels": encode_pixels(pixels),
+    }
+
+
+async def request_render(
+    host: str,
+    port: int,
+    job: Dict[str, Any],
+    on_tile: Callable[[int, List[int]], None] | None = None,
+) -> Tuple[Framebuffer, bool]:
+    # Sends a job and assembles the streamed tiles. Returns the image and
+    # whether it came from the cache.
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await write_message(writer, job)
+        tiles = []
+        while True:
+            message = await read_message(reader)
+            if message["type"] == "error":
+                raise RuntimeError(message["message"])
+            if message["type"] == "done":
+                break
+            tiles.append(message)
+            if on_tile is not None:
+                on_tile(message["tile"], message["bounds"])
+    finally:
+        writer.close()
+
+    width = max(t["bounds"][2] for t in tiles)
+    height = max(t["bounds"][3] for t in tiles)
+    fb = Framebuffer(width, height)
+    for t in tiles:
+        paste(fb, tuple(t["bounds"]), decode_pixels(t["pixels"]))
+    return fb, message["cached"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Render service and client")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run the service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--cache", default=".render-cache", help="Cache directory")
+    serve.add_argument("--cache-mb", type=float, default=512, help="Image cache size")
+    serve.add_argument("--workers", type=int, help="Worker processes")
+    render = sub.add_parser("render", help="Send a job and write the image")
+    render.add_argument("job", help="JSON job file")
+    render.add_argument("output", help="Image path")
+    render.add_argument("--host", default="127.0.0.1")
+    render.add_argument("--port", type=int, default=8765)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "serve":
+        service = RenderService(args.cache, int(args.cache_mb * 1e6), args.workers)
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.executor.shutdown(cancel_futures=True)
+        return
+
+    with open(args.job) as f:
+        job = json.load(f)
+    start = time.perf_counter()
+    tiles = 0
+
+    def on_tile(n: int, bounds: List[int]) -> None:
+        nonlocal tiles
+        tiles += 1
+        print(f"\rTiles received: {tiles}", end="", flush=True)
+
+    fb, cached = asyncio.run(request_render(args.host, args.port, job, on_tile))
+    source = "cache" if cached else "render"
+    print(f"\n{source} in {time.perf_counter() - start:.2f}s")
+    fb.write(args.output)
+
+
+if __name__ == "__main__":
+    main()
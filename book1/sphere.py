@@ -1,41 +1,68 @@
 import math
 from hittable import Hittable, HitRecord
-from vec3 import Vec3, Point3, dot
+from vec3 import Vec3, Point3
 from ray import Ray
-from interval import Interval
 from material import Material
+from aabb import AABB
+from typing import Tuple
 
 
 class Sphere(Hittable):
     center: Point3
     radius: float
     mat: Material
+    # Built on first use, which keeps bulk scene loading cheap
+    bbox: AABB | None
 
     def __init__(self, center: Point3, radius: float, mat: Material) -> None:
         self.center = center
         self.radius = radius
         self.mat = mat
+        self.bbox = None
 
-    def hit(self, r: Ray, ray_t: Interval, rec: HitRecord) -> bool:
-        oc = r.origin - self.center
-        a = r.direction.length_squared()
-        half_b = dot(oc, r.direction)
-        c = oc.length_squared() - self.radius * self.radius
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        # Work on plain floats; nothing is allocated unless the ray hits
+        o = r.origin
+        d = r.direction
+        center = self.center
+        ocx = o.x - center.x
+        ocy = o.y - center.y
+        ocz = o.z - center.z
+        a = d.x * d.x + d.y * d.y + d.z * d.z
+        half_b = ocx * d.x + ocy * d.y + ocz * d.z
+        c = ocx * ocx + ocy * ocy + ocz * ocz - self.radius * self.radius
 
         discriminant = half_b * half_b - a * c
         if discriminant < 0:
-            return False
+            return None
         sqrtd = math.sqrt(discriminant)
 
         root = (-half_b - sqrtd) / a
-        if not ray_t.surrounds(root):
+        if not t_min < root < t_max:
             root = (-half_b + sqrtd) / a
-            if not ray_t.surrounds(root):
-                return False
+            if not t_min < root < t_max:
+                return None
+        return root, self
 
-        rec.t = root
-        rec.p = r.at(rec.t)
-        outward_normal = (rec.p - self.center) / self.radius
-        rec.set_face_normal(r, outward_normal)
+    def finalize(self, r: Ray, t: float, rec: HitRecord) -> None:
+        center = self.center
+        d = r.direction
+        rec.t = t
+        # A fresh point and normal: callers may keep references to the old ones
+        rec.p = r.at(t)
+        inv_radius = 1 / self.radius
+        nx = (rec.p.x - center.x) * inv_radius
+        ny = (rec.p.y - center.y) * inv_radius
+        nz = (rec.p.z - center.z) * inv_radius
+        rec.front_face = d.x * nx + d.y * ny + d.z * nz < 0
+        rec.normal = Vec3(nx, ny, nz) if rec.front_face else Vec3(-nx, -ny, -nz)
         rec.mat = self.mat
-        return True
+
+    def bounding_box(self) -> AABB:
+        if self.bbox is None:
+            # Hollow glass uses a negative radius, so box with its magnitude
+            r = Vec3(abs(self.radius), abs(self.radius), abs(self.radius))
+            self.bbox = AABB.from_points(self.center - r, self.center + r)
+        return self.bbox
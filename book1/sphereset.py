@@ -0,0 +1,164 @@
+"""
+Struct-of-arrays sphere primitive
+
+A `SphereSet` keeps the centres, radii and material indices of many spheres in
+contiguous NumPy arrays and finds the closest of them for a ray with one
+vectorized quadratic solve, instead of one `Sphere.hit` call per sphere.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+import math
+import numpy as np
+from aabb import AABB
+from hittable import Hittable, HittableList
+from interval import Interval
+from material import Material
+from ray import Ray
+from sphere import Sphere
+from vec3 import Point3, Vec3
+
+if TYPE_CHECKING:
+    from stats import RenderStats
+
+
+class SphereSet(Hittable):
+    center: np.ndarray
+    radius: np.ndarray
+    mat_index: np.ndarray
+    materials: List[Material]
+    bbox: AABB
+    stats: "RenderStats | None" = None
+
+    def __init__(
+        self,
+        center: Sequence[float] | np.ndarray,
+        radius: Sequence[float] | np.ndarray,
+        mat_index: Sequence[int] | np.ndarray,
+        materials: List[Material],
+    ) -> None:
+        self.center = np.ascontiguousarray(center, dtype=np.float64).reshape(-1, 3)
+        self.radius = np.ascontiguousarray(radius, dtype=np.float64)
+        self.mat_index = np.ascontiguousarray(mat_index, dtype=np.intp)
+        self.materials = materials
+        if not len(self.radius):
+            raise ValueError("SphereSet needs at least one sphere")
+        self.r2 = self.radius * self.radius
+
+        # Hollow glass uses a negative radius, so box with its magnitude
+        extent = np.abs(self.radius)[:, None]
+        lo = (self.center - extent).min(axis=0)
+        hi = (self.center + extent).max(axis=0)
+        self.bbox = AABB(
+            Interval(float(lo[0]), float(hi[0])),
+            Interval(float(lo[1]), float(hi[1])),
+            Interval(float(lo[2]), float(hi[2])),
+        )
+
+    @classmethod
+    def from_spheres(cls, spheres: Sequence[Sphere]) -> SphereSet:
+        materials: List[Material] = []
+        lookup: dict[int, int] = {}
+        mat_index = []
+        for s in spheres:
+            if id(s.mat) not in lookup:
+                lookup[id(s.mat)] = len(materials)
+                materials.append(s.mat)
+            mat_index.append(lookup[id(s.mat)])
+        return cls(
+            [(s.center.x, s.center.y, s.center.z) for s in spheres],
+            [s.radius for s in spheres],
+            mat_index,
+            materials,
+        )
+
+    def __len__(self) -> int:
+        return len(self.radius)
+
+    def spheres(self) -> List[Sphere]:
+        # The set as individual `Sphere`s, for code that needs objects
+        return [
+            Sphere(Point3(*c), r, self.materials[m])
+            for c, r, m in zip(
+                self.center.tolist(), self.radius.tolist(), self.mat_index.tolist()
+            )
+        ]
+
+    def intersect(
+        self, r: Ray, t_min: float, t_max: float
+    ) -> Tuple[float, Hittable] | None:
+        if self.stats is not None:
+            self.stats.intersection_tests += len(self.radius)
+        o = r.origin
+        d = r.direction
+        direction = np.array((d.x, d.y, d.z))
+
+        # Solve every sphere's quadratic at once, then only look at roots of
+        # the spheres the ray actually crosses
+        oc = self.center - np.array((o.x, o.y, o.z))
+        half_b = -(oc @ direction)
+        c = np.einsum("ij,ij->i", oc, oc) - self.r2
+        a = d.x * d.x + d.y * d.y + d.z * d.z
+        discriminant = half_b * half_b - a * c
+        candidates = np.flatnonzero(discriminant >= 0)
+        if not len(candidates):
+            return None
+
+        half_b = half_b[candidates]
+        sqrtd = np.sqrt(discriminant[candidates])
+        near = (-half_b - sqrtd) / a
+        far = (-half_b + sqrtd) / a
+        roots = np.where(
+            (near > t_min) & (near < t_max),
+            near,
+            np.where((far > t_min) & (far < t_max), far, np.inf),
+        )
+        k = int(np.argmin(roots))
+        root = float(roots[k])
+        if math.isinf(root):
+            return None
+        return root, self.sphere(int(candidates[k]))
+
+    def sphere(self, index: int) -> Sphere:
+        # Sphere `index` as an object; its `finalize` fills in the hit record
+        cx, cy, cz = self.center[index].tolist()
+        mat = self.materials[self.mat_index[index]]
+        return Sphere(Point3(cx, cy, cz), float(self.radius[index]), mat)
+
+    def select(
+        self, planes: Sequence[Tuple[Vec3, float]], slack: float
+    ) -> SphereSet | None:
+        # The spheres inside every plane, given as (unit normal, offset) with
+        # dot(normal, p) + offset >= 0 inside, to within their radius plus
+        # `slack`. Returns None if there are none, and the set itself if it
+        # keeps them all.
+        keep = np.ones(len(self.radius), dtype=bool)
+        extent = np.abs(self.radius) + slack
+        for n, offset in planes:
+            keep &= self.center @ np.array((n.x, n.y, n.z)) + offset >= -extent
+        if not keep.any():
+            return None
+        if keep.all():
+            return self
+        return SphereSet(
+            self.center[keep], self.radius[keep], self.mat_index[keep], self.materials
+        )
+
+    def bounding_box(self) -> AABB:
+        return self.bbox
+
+
+def collapse(world: HittableList, max_radius: float = math.inf) -> HittableList:
+    # Replaces the top-level spheres no bigger than `max_radius` with one
+    # `SphereSet`, leaving bigger spheres and other hittables as they are
+    small = [
+        obj
+        for obj in world.objects
+        if isinstance(obj, Sphere) and abs(obj.radius) <= max_radius
+    ]
+    if len(small) < 2:
+        return world
+    ids = {id(s) for s in small}
+    collapsed = HittableList()
+    collapsed.extend([obj for obj in world.objects if id(obj) not in ids])
+    collapsed.add(SphereSet.from_spheres(small))
+    return collapsed
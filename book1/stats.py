@@ -0,0 +1,118 @@
+from bvh import BVHNode
+from hittable import Hittable, HittableList
+from typing import Any, Dict, List
+import json
+import threading
+
+
+class RenderStats:
+    # Counters collected while rendering when `Camera.stats` is set
+    primary_rays: int
+    secondary_rays: int
+    intersection_tests: int
+    bbox_tests: int
+    material_hits: Dict[str, int]
+    absorbed: Dict[str, int]
+    depth_histogram: List[int]
+    max_depth_terminations: int
+    roulette_terminations: int
+    scanline_seconds: List[float]
+    tile_seconds: List[float]
+
+    def __init__(self) -> None:
+        self.primary_rays = 0
+        self.secondary_rays = 0
+        self.intersection_tests = 0
+        self.bbox_tests = 0
+        self.material_hits = {}
+        self.absorbed = {}
+        # depth_histogram[n] is the number of paths that traced n segments
+        self.depth_histogram = []
+        self.max_depth_terminations = 0
+        self.roulette_terminations = 0
+        self.scanline_seconds = []
+        self.tile_seconds = []
+
+    def record_hit(self, material: str) -> None:
+        self.material_hits[material] = self.material_hits.get(material, 0) + 1
+
+    def record_absorbed(self, material: str) -> None:
+        self.absorbed[material] = self.absorbed.get(material, 0) + 1
+
+    def record_path(self, segments: int) -> None:
+        histogram = self.depth_histogram
+        if segments >= len(histogram):
+            histogram.extend([0] * (segments + 1 - len(histogram)))
+        histogram[segments] += 1
+
+    def average_depth(self) -> float:
+        paths = sum(self.depth_histogram)
+        if not paths:
+            return 0.0
+        return sum(n * c for n, c in enumerate(self.depth_histogram)) / paths
+
+    def merge(self, other: "RenderStats") -> None:
+        # Fold in stats collected elsewhere, e.g. by a tile worker
+        self.primary_rays += other.primary_rays
+        self.secondary_rays += other.secondary_rays
+        self.intersection_tests += other.intersection_tests
+        self.bbox_tests += other.bbox_tests
+        for k, v in other.material_hits.items():
+            self.material_hits[k] = self.material_hits.get(k, 0) + v
+        for k, v in other.absorbed.items():
+            self.absorbed[k] = self.absorbed.get(k, 0) + v
+        histogram = self.depth_histogram
+        if len(other.depth_histogram) > len(histogram):
+            histogram.extend([0] * (len(other.depth_histogram) - len(histogram)))
+        for n, c in enumerate(other.depth_histogram):
+            histogram[n] += c
+        self.max_depth_terminations += other.max_depth_terminations
+        self.roulette_terminations += other.roulette_terminations
+        self.scanline_seconds.extend(other.scanline_seconds)
+        self.tile_seconds.extend(other.tile_seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "primary_rays": self.primary_rays,
+            "secondary_rays": self.secondary_rays,
+            "intersection_tests": self.intersection_tests,
+            "bbox_tests": self.bbox_tests,
+            "material_hits": self.material_hits,
+            "absorbed": self.absorbed,
+            "depth_histogram": self.depth_histogram,
+            "average_depth": self.average_depth(),
+            "max_depth_terminations": self.max_depth_terminations,
+            "roulette_terminations": self.roulette_terminations,
+            "scanline_seconds": self.scanline_seconds,
+            "tile_seconds": self.tile_seconds,
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class ThreadStats(threading.local, RenderStats):
+    # A `RenderStats` with its own counters in every thread that touches it,
+    # for a world that threads render at once: each thread counts into its
+    # own copy, so no two threads update the same counter
+    def drain_into(self, stats: RenderStats) -> None:
+        # Move the calling thread's counts into `stats` and start afresh
+        stats.merge(self)
+        RenderStats.__init__(self)
+
+
+def attach(world: Hittable, stats: RenderStats | None) -> None:
+    # Point every container in the world at `stats` (or detach with None)
+    if isinstance(world, HittableList):
+        world.stats = stats
+        for obj in world.objects:
+            attach(obj, stats)
+    elif isinstance(world, BVHNode):
+        world.stats = stats
+        attach(world.left, stats)
+        if world.right is not world.left:
+            attach(world.right, stats)
+    elif hasattr(world, "stats"):
+        # Primitives that count their own tests, like `SphereSet`
+        world.stats = stats
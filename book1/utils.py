@@ -3,3 +3,19 @@ import math
 
 def degrees_to_radians(d: float) -> float:
     return d * math.pi / 180.0
+
+
+def tile_seed(seed: int | None, tile: int) -> str:
+    # String seeds are hashed by `rng.seed`, which gives every
+    # (seed, tile) pair an independent and reproducible stream
+    return f"{seed or 0}:{tile}"
+
+
+def pass_seed(seed: int | None, sample_pass: int, row: int) -> str:
+    # Stream for one scanline of one sample pass, see `tile_seed`
+    return f"{seed or 0}:pass{sample_pass}:{row}"
+
+
+def frame_seed(seed: int | None, frame: int) -> str:
+    # Stream for one frame of a batch render, see `tile_seed`
+    return f"{seed or 0}:frame{frame}"
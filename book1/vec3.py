@@ -1,10 +1,13 @@
 from __future__ import annotations
 from typing import Self, TypeAlias, Any
-import random
 import math
+from rng import random, uniform
 
 
 class Vec3:
+    # No per-instance __dict__: vectors are created by the million
+    __slots__ = ("x", "y", "z")
+
     x: float
     y: float
     z: float
@@ -43,40 +46,67 @@ class Vec3:
         return self.x < v and self.y < v and self.z < v
 
     def __add__(self, v: Self | float) -> Vec3:
-        if isinstance(v, Vec3):
+        if type(v) is Vec3:
             return Vec3(self.x + v.x, self.y + v.y, self.z + v.z)
-        elif isinstance(v, float | int):
-            return Vec3(self.x + v, self.y + v, self.z + v)
-        raise NotImplementedError
+        return Vec3(self.x + v, self.y + v, self.z + v)
 
     def __radd__(self, v):
         return Vec3(v + self.x, v + self.y, v + self.z)
 
+    def __iadd__(self, v: Self | float) -> Vec3:
+        if type(v) is Vec3:
+            self.x += v.x
+            self.y += v.y
+            self.z += v.z
+        else:
+            self.x += v
+            self.y += v
+            self.z += v
+        return self
+
     def __sub__(self, v: Self | float) -> Vec3:
-        if isinstance(v, Vec3):
+        if type(v) is Vec3:
             return Vec3(self.x - v.x, self.y - v.y, self.z - v.z)
-        elif isinstance(v, float | int):
-            return Vec3(self.x - v, self.y - v, self.z - v)
-        raise NotImplementedError
+        return Vec3(self.x - v, self.y - v, self.z - v)
 
     def __rsub__(self, v: float) -> Vec3:
-        return Vec3(v - self.x, v - self.y - v, v - self.z)
+        return Vec3(v - self.x, v - self.y, v - self.z)
+
+    def __isub__(self, v: Self | float) -> Vec3:
+        if type(v) is Vec3:
+            self.x -= v.x
+            self.y -= v.y
+            self.z -= v.z
+        else:
+            self.x -= v
+            self.y -= v
+            self.z -= v
+        return self
 
     def __mul__(self, v: Self | float) -> Vec3:
-        if isinstance(v, Vec3):
+        if type(v) is Vec3:
             return Vec3(self.x * v.x, self.y * v.y, self.z * v.z)
-        if isinstance(v, float | int):
-            return Vec3(self.x * v, self.y * v, self.z * v)
-        raise NotImplementedError
+        return Vec3(self.x * v, self.y * v, self.z * v)
 
     def __rmul__(self, v: float) -> Vec3:
         return Vec3(self.x * v, self.y * v, self.z * v)
 
+    def __imul__(self, v: Self | float) -> Vec3:
+        if type(v) is Vec3:
+            self.x *= v.x
+            self.y *= v.y
+            self.z *= v.z
+        else:
+            self.x *= v
+            self.y *= v
+            self.z *= v
+        return self
+
     def __truediv__(self, v: Self | float) -> Vec3:
-        if isinstance(v, Vec3):
-            return Vec3(self.x * (1 / v.x), self.y * (1 / v.y), self.z * (1 / v.z))
-        elif isinstance(v, float | int):
-            return Vec3(self.x * (1 / v), self.y * (1 / v), self.z * (1 / v))
+        if type(v) is Vec3:
+            return Vec3(self.x / v.x, self.y / v.y, self.z / v.z)
+        inv = 1 / v
+        return Vec3(self.x * inv, self.y * inv, self.z * inv)
 
     def __rtruediv__(self, v: float):
         return Vec3(self.x * (1 / v), self.y * (1 / v), self.z * (1 / v))
@@ -84,6 +114,16 @@ class Vec3:
     def __neg__(self) -> Vec3:
         return Vec3(-self.x, -self.y, -self.z)
 
+    def copy(self) -> Vec3:
+        return Vec3(self.x, self.y, self.z)
+
+    def add_scaled(self, v: Self, s: float) -> Vec3:
+        # In-place `self += v * s` without the temporary
+        self.x += v.x * s
+        self.y += v.y * s
+        self.z += v.z * s
+        return self
+
     def length(self) -> float:
         return math.sqrt(self.length_squared())
 
@@ -97,40 +137,70 @@ class Vec3:
     @classmethod
     def random(cls, min_value: float = 0, max_value: float = 1) -> Vec3:
         return cls(
-            random.uniform(min_value, max_value),
-            random.uniform(min_value, max_value),
-            random.uniform(min_value, max_value),
+            uniform(min_value, max_value),
+            uniform(min_value, max_value),
+            uniform(min_value, max_value),
         )
 
 
 def unit_vector(v) -> Vec3:
-    return v / v.length()
+    inv = 1 / math.sqrt(v.x * v.x + v.y * v.y + v.z * v.z)
+    return Vec3(v.x * inv, v.y * inv, v.z * inv)
 
 
 def random_in_unit_disk() -> Vec3:
-    while True:
-        p = Vec3(random.uniform(-1, 1), random.uniform(-1, 1), 0)
-        if p.length_squared() < 1:
-            return p
+    # Polar sampling: sqrt keeps the density uniform over the area
+    r = math.sqrt(random())
+    phi = 2 * math.pi * random()
+    return Vec3(r * math.cos(phi), r * math.sin(phi), 0)
 
 
 def random_vector(min_value: float = 0, max_value: float = 1) -> Vec3:
     return Vec3(
-        random.uniform(min_value, max_value),
-        random.uniform(min_value, max_value),
-        random.uniform(min_value, max_value),
+        uniform(min_value, max_value),
+        uniform(min_value, max_value),
+        uniform(min_value, max_value),
     )
 
 
 def random_in_unit_sphere() -> Vec3:
-    while True:
-        p = random_vector(-1, 1)
-        if p.length_squared() < 1:
-            return p
+    # A direction scaled by the cube root of a uniform radius
+    p = random_unit_vector()
+    p *= random() ** (1 / 3)
+    return p
 
 
 def random_unit_vector() -> Vec3:
-    return unit_vector(random_in_unit_sphere())
+    # Uniform z and azimuth cover the sphere evenly (Archimedes), with no
+    # rejection loop
+    z = 1 - 2 * random()
+    r = math.sqrt(1 - z * z)
+    phi = 2 * math.pi * random()
+    return Vec3(r * math.cos(phi), r * math.sin(phi), z)
+
+
+def square_to_unit_vector(u: float, v: float) -> Vec3:
+    # Area-preserving map from [0, 1)^2 onto the unit sphere, so stratified
+    # points stay stratified
+    z = 1 - 2 * u
+    r = math.sqrt(max(0.0, 1 - z * z))
+    phi = 2 * math.pi * v
+    return Vec3(r * math.cos(phi), r * math.sin(phi), z)
+
+
+def square_to_unit_disk(u: float, v: float) -> Vec3:
+    # Shirley-Chiu concentric map: squares go to rings, keeping strata compact
+    a = 2 * u - 1
+    b = 2 * v - 1
+    if a == 0 and b == 0:
+        return Vec3(0, 0, 0)
+    if abs(a) > abs(b):
+        r = a
+        phi = (math.pi / 4) * (b / a)
+    else:
+        r = b
+        phi = (math.pi / 2) - (math.pi / 4) * (a / b)
+    return Vec3(r * math.cos(phi), r * math.sin(phi), 0)
 
 
 def random_on_hemisphere(normal: Vec3) -> Vec3:
@@ -141,14 +211,16 @@ def random_on_hemisphere(normal: Vec3) -> Vec3:
 
 
 def reflect(v: Vec3, n: Vec3) -> Vec3:
-    return v - 2 * dot(v, n) * n
+    s = -2 * (v.x * n.x + v.y * n.y + v.z * n.z)
+    return Vec3(v.x + s * n.x, v.y + s * n.y, v.z + s * n.z)
 
 
 def refract(uv: Vec3, n: Vec3, etai_over_etat: float) -> Vec3:
-    cos_theta = min(dot(-uv, n), 1.0)
-    r_out_perp = etai_over_etat * (uv + cos_theta * n)
-    r_out_parallel = -math.sqrt(math.fabs(1.0 - r_out_perp.length_squared())) * n
-    return r_out_perp + r_out_parallel
+    cos_theta = min(-(uv.x * n.x + uv.y * n.y + uv.z * n.z), 1.0)
+    r_out_perp = Vec3(uv.x, uv.y, uv.z).add_scaled(n, cos_theta)
+    r_out_perp *= etai_over_etat
+    s = -math.sqrt(math.fabs(1.0 - r_out_perp.length_squared()))
+    return r_out_perp.add_scaled(n, s)
 
 
 def dot(a: Vec3, b: Vec3) -> float:
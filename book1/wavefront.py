@@ -0,0 +1,311 @@
+"""
+Wavefront path tracer
+
+Traces every sample of a scanline at once as NumPy arrays instead of following
+one ray at a time through `Camera.ray_color`. After each bounce the rays that
+are still alive are compacted, and scattering runs as one array kernel per
+material type.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Generator, List, Tuple
+import numpy as np
+from array import array
+from framebuffer import Framebuffer
+from hittable import Hittable, HittableList
+from bvh import BVHNode
+from material import Lambertian, Metal, Dielectric, Material
+from sphere import Sphere
+from sphereset import SphereSet
+from vec3 import Vec3
+
+if TYPE_CHECKING:
+    from camera import Camera
+
+LAMBERTIAN = 0
+METAL = 1
+DIELECTRIC = 2
+
+# Upper bound on the size of the (rays x spheres) intersection matrices
+MAX_BATCH_ELEMENTS = 1 << 21
+
+
+class SceneArrays:
+    """Struct-of-arrays copy of a world made of spheres."""
+
+    center: np.ndarray
+    radius: np.ndarray
+    mat_index: np.ndarray
+    kind: np.ndarray
+    albedo: np.ndarray
+    fuzz: np.ndarray
+    ir: np.ndarray
+
+    def __init__(self, world: Hittable) -> None:
+        spheres = list(flatten(world))
+        materials: List[Material] = []
+        lookup: dict[int, int] = {}
+        mat_index = []
+        for s in spheres:
+            if id(s.mat) not in lookup:
+                lookup[id(s.mat)] = len(materials)
+                materials.append(s.mat)
+            mat_index.append(lookup[id(s.mat)])
+
+        self.center = np.array(
+            [as_array(s.center) for s in spheres], dtype=np.float64
+        ).reshape(-1, 3)
+        self.radius = np.array([s.radius for s in spheres], dtype=np.float64)
+        self.mat_index = np.array(mat_index, dtype=np.intp)
+
+        self.kind = np.zeros(len(materials), dtype=np.int8)
+        self.albedo = np.ones((len(materials), 3), dtype=np.float64)
+        self.fuzz = np.zeros(len(materials), dtype=np.float64)
+        self.ir = np.ones(len(materials), dtype=np.float64)
+        for k, m in enumerate(materials):
+            if isinstance(m, Lambertian):
+                self.kind[k] = LAMBERTIAN
+                self.albedo[k] = as_array(m.albedo)
+            elif isinstance(m, Metal):
+                self.kind[k] = METAL
+                self.albedo[k] = as_array(m.albedo)
+                self.fuzz[k] = m.fuzz
+            elif isinstance(m, Dielectric):
+                self.kind[k] = DIELECTRIC
+                self.ir[k] = m.ir
+            else:
+                raise TypeError(f"Unsupported material: {m.__class__.__name__}")
+
+
+def flatten(world: Hittable) -> Generator[Sphere, None, None]:
+    if isinstance(world, Sphere):
+        yield world
+    elif isinstance(world, HittableList):
+        for obj in world.objects:
+            yield from flatten(obj)
+    elif isinstance(world, SphereSet):
+        yield from world.spheres()
+    elif isinstance(world, BVHNode):
+        yield from flatten(world.left)
+        if world.right is not world.left:
+            yield from flatten(world.right)
+    else:
+        raise TypeError(f"Unsupported hittable: {world.__class__.__name__}")
+
+
+def as_array(v: Vec3) -> np.ndarray:
+    return np.array((v.x, v.y, v.z), dtype=np.float64)
+
+
+def dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", a, b)
+
+
+def unit_vectors(v: np.ndarray) -> np.ndarray:
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def random_unit_vectors(rng: np.random.Generator, n: int) -> np.ndarray:
+    return unit_vectors(rng.standard_normal((n, 3)))
+
+
+def random_in_unit_disk(rng: np.random.Generator, n: int) -> np.ndarray:
+    r = np.sqrt(rng.random(n))
+    phi = 2 * np.pi * rng.random(n)
+    return np.stack((r * np.cos(phi), r * np.sin(phi)), axis=1)
+
+
+def reflect(v: np.ndarray, n: np.ndarray) -> np.ndarray:
+    return v - 2 * dot(v, n)[:, None] * n
+
+
+def refract(uv: np.ndarray, n: np.ndarray, etai_over_etat: np.ndarray) -> np.ndarray:
+    cos_theta = np.minimum(dot(-uv, n), 1.0)
+    r_out_perp = etai_over_etat[:, None] * (uv + cos_theta[:, None] * n)
+    r_out_parallel = -np.sqrt(np.fabs(1.0 - dot(r_out_perp, r_out_perp)))[:, None] * n
+    return r_out_perp + r_out_parallel
+
+
+def reflectance(cosine: np.ndarray, ref_idx: np.ndarray) -> np.ndarray:
+    r0 = (1 - ref_idx) / (1 + ref_idx)
+    r0 = r0 * r0
+    return r0 + (1 - r0) * (1 - cosine) ** 5
+
+
+def intersect(
+    scene: SceneArrays,
+    origin: np.ndarray,
+    direction: np.ndarray,
+    t_min: float = 0.001,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Closest hit of every ray against every sphere. Returns the hit distance
+    (inf on a miss) and the index of the sphere that was hit.
+    """
+    n = len(origin)
+    t = np.full(n, np.inf)
+    index = np.zeros(n, dtype=np.intp)
+    if not len(scene.radius):
+        return t, index
+
+    step = max(1, MAX_BATCH_ELEMENTS // len(scene.radius))
+    r2 = scene.radius * scene.radius
+    for start in range(0, n, step):
+        o = origin[start : start + step]
+        d = direction[start : start + step]
+        oc = o[:, None, :] - scene.center[None, :, :]
+        a = dot(d, d)[:, None]
+        half_b = np.einsum("rsk,rk->rs", oc, d)
+        c = np.einsum("rsk,rsk->rs", oc, oc) - r2
+        discriminant = half_b * half_b - a * c
+        sqrtd = np.sqrt(np.maximum(discriminant, 0))
+
+        root = (-half_b - sqrtd) / a
+        far = (-half_b + sqrtd) / a
+        root = np.where(root > t_min, root, far)
+        root = np.where((discriminant >= 0) & (root > t_min), root, np.inf)
+
+        closest = np.argmin(root, axis=1)
+        t[start : start + step] = root[np.arange(len(o)), closest]
+        index[start : start + step] = closest
+    return t, index
+
+
+def scatter(
+    scene: SceneArrays,
+    rng: np.random.Generator,
+    direction: np.ndarray,
+    outward_normal: np.ndarray,
+    mat: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scatters a batch of hits. Returns the new directions, their attenuation and
+    a mask of rays that were not absorbed.
+    """
+    n = len(direction)
+    front_face = dot(direction, outward_normal) < 0
+    normal = np.where(front_face[:, None], outward_normal, -outward_normal)
+    kind = scene.kind[mat]
+    new_direction = np.empty_like(direction)
+    attenuation = scene.albedo[mat]
+    alive = np.ones(n, dtype=bool)
+
+    sel = np.flatnonzero(kind == LAMBERTIAN)
+    if len(sel):
+        d = normal[sel] + random_unit_vectors(rng, len(sel))
+        near_zero = np.all(np.fabs(d) < 1e-8, axis=1)
+        d[near_zero] = normal[sel][near_zero]
+        new_direction[sel] = d
+
+    sel = np.flatnonzero(kind == METAL)
+    if len(sel):
+        reflected = reflect(unit_vectors(direction[sel]), normal[sel])
+        d = reflected + scene.fuzz[mat[sel]][:, None] * random_unit_vectors(
+            rng, len(sel)
+        )
+        new_direction[sel] = d
+        alive[sel] = dot(d, normal[sel]) > 0
+
+    sel = np.flatnonzero(kind == DIELECTRIC)
+    if len(sel):
+        ir = scene.ir[mat[sel]]
+        refraction_ratio = np.where(front_face[sel], 1.0 / ir, ir)
+        unit_direction = unit_vectors(direction[sel])
+        nrm = normal[sel]
+        cos_theta = np.minimum(dot(-unit_direction, nrm), 1.0)
+        sin_theta = np.sqrt(np.maximum(0.0, 1.0 - cos_theta * cos_theta))
+        cannot_refract = refraction_ratio * sin_theta > 1.0
+        reflects = cannot_refract | (
+            reflectance(cos_theta, refraction_ratio) > rng.random(len(sel))
+        )
+        new_direction[sel] = np.where(
+            reflects[:, None],
+            reflect(unit_direction, nrm),
+            refract(unit_direction, nrm, refraction_ratio),
+        )
+
+    return new_direction, attenuation, alive
+
+
+def trace(
+    scene: SceneArrays,
+    rng: np.random.Generator,
+    origin: np.ndarray,
+    direction: np.ndarray,
+    max_depth: int,
+) -> np.ndarray:
+    """Traces a batch of camera rays and returns the radiance of each one."""
+    color = np.zeros_like(origin)
+    throughput = np.ones_like(origin)
+    # Indices of the rays that are still bouncing around the scene
+    active = np.arange(len(origin))
+
+    for _ in range(max_depth):
+        if not len(active):
+            break
+        t, sphere = intersect(scene, origin, direction)
+        missed = np.isinf(t)
+
+        # Rays escaping the scene pick up the sky gradient
+        if np.any(missed):
+            unit_direction = unit_vectors(direction[missed])
+            a = (0.5 * (unit_direction[:, 1] + 1.0))[:, None]
+            sky = (1.0 - a) * 1.0 + a * np.array((0.5, 0.7, 1.0))
+            color[active[missed]] = throughput[missed] * sky
+
+        hit = ~missed
+        active, origin, direction = active[hit], origin[hit], direction[hit]
+        throughput, t, sphere = throughput[hit], t[hit], sphere[hit]
+
+        p = origin + direction * t[:, None]
+        outward_normal = (p - scene.center[sphere]) / scene.radius[sphere][:, None]
+        direction, attenuation, alive = scatter(
+            scene, rng, direction, outward_normal, scene.mat_index[sphere]
+        )
+
+        # Compact the survivors so the next bounce only touches live rays
+        active = active[alive]
+        origin = p[alive]
+        direction = direction[alive]
+        throughput = throughput[alive] * attenuation[alive]
+
+    # Rays still alive after `max_depth` bounces contribute no light
+    return color
+
+
+def render(cam: Camera, world: Hittable) -> Framebuffer:
+    """
+    Drop-in replacement for `Camera.render` that traces one scanline of samples
+    per batch.
+    """
+    fb = Framebuffer(cam.image_width, cam.image_height)
+    stride = 3 * cam.image_width
+    scene = SceneArrays(world)
+    rng = np.random.default_rng(cam.seed)
+    spp = cam.samples_per_pixel
+    px00 = as_array(cam.px00_loc)
+    du = as_array(cam.px_delta_u)
+    dv = as_array(cam.px_delta_v)
+    center = as_array(cam.center)
+    disk_u = as_array(cam.defocus_disk_u)
+    disk_v = as_array(cam.defocus_disk_v)
+    i = np.repeat(np.arange(cam.image_width), spp).astype(np.float64)
+    n = len(i)
+
+    for j in range(cam.image_height):
+        print(f"Scanlines remaining: {(cam.image_height - 1) - j} ", end="\r")
+        # Same jitter as `Camera.pixel_sample_square` with independent samples
+        px_sample = (
+            px00
+            + (i + rng.random(n) - 0.5)[:, None] * du
+            + (j + rng.random(n) - 0.5)[:, None] * dv
+        )
+        if cam.defocus_angle > 0:
+            p = random_in_unit_disk(rng, n)
+            origin = center + p[:, :1] * disk_u + p[:, 1:] * disk_v
+        else:
+            origin = np.broadcast_to(center, (n, 3)).copy()
+
+        color = trace(scene, rng, origin, px_sample - origin, cam.max_depth)
+        pixels = color.reshape(cam.image_width, spp, 3).mean(axis=1)
+        fb.data[j * stride : (j + 1) * stride] = array("d", pixels.ravel().tobytes())
+    return fb